@@ -0,0 +1,170 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+"""
+Measures the time needed for importing and initializing :mod:`score.svg`.
+
+Imports are measured in fresh interpreters, after the score modules this
+module depends on have already been imported, so only the cost of
+:mod:`score.svg` itself is reported. The benchmark also fails if importing
+:mod:`score.svg` pulls in any of the modules that should only be loaded when
+they are first needed::
+
+    python benchmarks/bench_startup.py --max-import-ms 5 --max-init-ms 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standins  # noqa: E402
+
+
+lazy_modules = (
+    'xml.etree.ElementTree',
+    'json',
+    'cairosvg',
+    'PIL',
+)
+
+import_script = '''
+import json, sys, time
+import score.init, score.tpl, score.webassets
+before = set(sys.modules)
+started = time.perf_counter()
+import score.svg
+duration = time.perf_counter() - started
+print(json.dumps([duration, sorted(set(sys.modules) - before)]))
+'''
+
+
+def measure_import(runs):
+    """
+    Imports :mod:`score.svg` in *runs* fresh interpreters and returns the
+    import durations and the modules it loaded.
+    """
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', import_script])
+        duration, modules = json.loads(output.decode('UTF-8'))
+        timings.append(duration)
+    return timings, modules
+
+
+def measure_init(runs, icons):
+    """
+    Initializes :mod:`score.svg` *runs* times with the local stand-ins of its
+    dependencies and returns the durations.
+    """
+    import score.svg
+    folder = tempfile.mkdtemp(prefix='score.svg-bench-')
+    try:
+        rootdir = os.path.join(folder, 'icons')
+        standins.generate_icons(rootdir, icons)
+        timings = []
+        for i in range(runs):
+            cachedir = os.path.join(folder, 'cache%d' % i)
+            http = standins.Http()
+            webassets = standins.Webassets(cachedir, False)
+            tpl = standins.Tpl()
+            css = standins.Css()
+            started = time.perf_counter()
+            score.svg.init({
+                'rootdir': rootdir,
+                'cachedir': os.path.join(cachedir, 'svg'),
+            }, http, webassets, tpl, css)
+            timings.append(time.perf_counter() - started)
+        return timings
+    finally:
+        shutil.rmtree(folder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--runs', default=10, type=int,
+        help='number of measurements per benchmark')
+    parser.add_argument(
+        '--icons', default=1000, type=int,
+        help='number of icons in the generated icon set')
+    parser.add_argument(
+        '--max-import-ms', type=float,
+        help='fail if the median import time exceeds this value')
+    parser.add_argument(
+        '--max-init-ms', type=float,
+        help='fail if the median initialization time exceeds this value')
+    parser.add_argument(
+        '--output', help='file to write the JSON results to')
+    args = parser.parse_args(argv)
+    import_timings, modules = measure_import(args.runs)
+    init_timings = measure_init(args.runs, args.icons)
+    eager = [module for module in modules
+             if any(module == lazy or module.startswith(lazy + '.')
+                    for lazy in lazy_modules)]
+    results = {
+        'import': {
+            'median': statistics.median(import_timings),
+            'min': min(import_timings),
+            'max': max(import_timings),
+            'modules': modules,
+            'eager_modules': eager,
+        },
+        'init': {
+            'median': statistics.median(init_timings),
+            'min': min(init_timings),
+            'max': max(init_timings),
+        },
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    failures = []
+    if eager:
+        failures.append('modules imported eagerly: ' + ', '.join(eager))
+    import_ms = results['import']['median'] * 1000
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append('import took %.3fms' % import_ms)
+    init_ms = results['init']['median'] * 1000
+    if args.max_init_ms is not None and init_ms > args.max_init_ms:
+        failures.append('init took %.3fms' % init_ms)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
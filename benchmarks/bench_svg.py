@@ -0,0 +1,276 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+"""
+Benchmarks the hot paths of :mod:`score.svg` on synthetic icon sets.
+
+Each benchmark is measured on a *cold* module (freshly initialized, empty
+cache folder) and on a *warm* one (same module, caches populated by previous
+runs). The results contain latency statistics, throughput and the peak
+memory allocated by python during a single run, and are written as JSON::
+
+    python benchmarks/bench_svg.py --sizes 10,1000 --output before.json
+    python benchmarks/bench_svg.py --sizes 10,1000 --compare before.json
+
+The second invocation prints the ratio of each median latency to the one
+found in the given file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import score.svg  # noqa: E402
+from score.svg._init import Sprite, svg2png  # noqa: E402
+import standins  # noqa: E402
+
+
+class Fixture:
+    """
+    An icon set of a given *size* on disk and a factory for freshly
+    initialized modules operating on it.
+    """
+
+    def __init__(self, folder, size, versioned=True):
+        self.folder = folder
+        self.versioned = versioned
+        self.rootdir = os.path.join(folder, 'icons')
+        self.paths = standins.generate_icons(self.rootdir, size)
+        self.sample = self.paths[::max(1, len(self.paths) // 50)]
+        self.instances = 0
+
+    def module(self, combine):
+        self.instances += 1
+        cachedir = os.path.join(self.folder, 'cache%d' % self.instances)
+        http = standins.Http()
+        webassets = standins.Webassets(cachedir, self.versioned)
+        tpl = standins.Tpl()
+        css = standins.Css()
+        conf = score.svg.init({
+            'rootdir': self.rootdir,
+            'cachedir': os.path.join(cachedir, 'svg'),
+            'combine': combine,
+        }, http, webassets, tpl, css)
+        return conf, css, standins.Context(http)
+
+
+def measure(func, iterations):
+    """
+    Invokes *func* *iterations* times and returns the duration of each
+    invocation.
+    """
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def peak_memory(func):
+    """
+    Invokes *func* once and returns the peak memory allocated by python
+    during that call. Kept separate from :func:`measure`, as tracing memory
+    allocations slows down the invocation considerably.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(timings, peak, operations):
+    return {
+        'runs': len(timings),
+        'operations': operations,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'ops_per_second': operations / statistics.median(timings),
+        'peak_memory': peak,
+    }
+
+
+def benchmarks(fixture, args):
+    """
+    Yields 3-tuples describing each benchmark: its name, the number of
+    operations performed per run and a function preparing a cold module and
+    returning the callable to measure. The preparation function is invoked
+    twice per benchmark: once for measuring time and once for measuring
+    memory on a cold module.
+    """
+    sample = fixture.sample
+
+    def icon(combine):
+        def prepare():
+            conf, _, ctx = fixture.module(combine)
+            return lambda: [conf.icon(ctx, path) for path in sample]
+        return prepare
+
+    def icon_css(combine):
+        def prepare():
+            conf, _, ctx = fixture.module(combine)
+            return lambda: [conf.icon_css(ctx, path) for path in sample]
+        return prepare
+
+    def virtcss(combine):
+        def prepare():
+            _, css, ctx = fixture.module(combine)
+            return lambda: css.virtuals['icons'](ctx)
+        return prepare
+
+    def sprite():
+        conf, _, ctx = fixture.module(True)
+        return lambda: Sprite(ctx, conf)
+
+    def sprite_content():
+        conf, _, ctx = fixture.module(True)
+        sprite = Sprite(ctx, conf)
+        return sprite._generate_content
+
+    def png():
+        conf, _, ctx = fixture.module(False)
+        svgs = [conf.svg(ctx, path) for path in sample]
+        return lambda: [svg2png(svg) for svg in svgs]
+
+    def png_sprite():
+        conf, _, ctx = fixture.module(True)
+        return lambda: conf.render_png_sprite(ctx)
+
+    yield 'icon', len(sample), icon(False)
+    yield 'icon[combine]', len(sample), icon(True)
+    yield 'icon_css', len(sample), icon_css(False)
+    yield 'icon_css[combine]', len(sample), icon_css(True)
+    yield 'virtcss', len(fixture.paths), virtcss(False)
+    yield 'virtcss[combine]', len(fixture.paths), virtcss(True)
+    yield 'sprite', len(fixture.paths), sprite
+    yield 'sprite_content', len(fixture.paths), sprite_content
+    if not args.skip_png:
+        yield 'svg2png', len(sample), png
+        if len(fixture.paths) <= args.png_sprite_limit:
+            yield 'svg2png[sprite]', len(fixture.paths), png_sprite
+
+
+def run(args):
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'version': _version(),
+        'timestamp': time.time(),
+        'benchmarks': {},
+    }
+    folder = tempfile.mkdtemp(prefix='score.svg-bench-')
+    try:
+        for size in args.sizes:
+            fixture = Fixture(os.path.join(folder, str(size)), size,
+                              versioned=not args.skip_png)
+            for name, operations, prepare in benchmarks(fixture, args):
+                func = prepare()
+                cold = summarize(measure(func, 1),
+                                 peak_memory(prepare()), operations)
+                warm = summarize(measure(func, args.iterations),
+                                 peak_memory(func), operations)
+                key = '%s/%d' % (name, size)
+                results['benchmarks'][key] = {'cold': cold, 'warm': warm}
+                _log('%-28s cold %10.3fms   warm %10.3fms' % (
+                    key, cold['median'] * 1000, warm['median'] * 1000))
+    finally:
+        shutil.rmtree(folder)
+    return results
+
+
+def compare(results, baseline):
+    for key, result in sorted(results['benchmarks'].items()):
+        try:
+            old = baseline['benchmarks'][key]
+        except KeyError:
+            continue
+        print('%-28s cold %6.2fx   warm %6.2fx' % (
+            key,
+            result['cold']['median'] / old['cold']['median'],
+            result['warm']['median'] / old['warm']['median']))
+
+
+def _version():
+    try:
+        from importlib.metadata import version
+        return version('score.svg')
+    except Exception:
+        return None
+
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--sizes', default='10,1000,10000',
+        type=lambda value: [int(v) for v in value.split(',')],
+        help='comma-separated number of icons per generated icon set')
+    parser.add_argument(
+        '--iterations', default=5, type=int,
+        help='number of warm runs per benchmark')
+    parser.add_argument(
+        '--skip-png', action='store_true',
+        help='skip benchmarks requiring CairoSVG; this also disables the '
+             'versionmanager, which would otherwise render pngs during url '
+             'generation')
+    parser.add_argument(
+        '--png-sprite-limit', default=100, type=int,
+        help='largest icon set to rasterize as a whole sprite')
+    parser.add_argument(
+        '--output', help='file to write the JSON results to')
+    parser.add_argument(
+        '--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args(argv)
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+"""
+Minimal local replacements for the configured :mod:`score.http`,
+:mod:`score.webassets`, :mod:`score.tpl` and :mod:`score.css` modules. They
+provide just enough of their interfaces to initialize :mod:`score.svg` and to
+exercise its hot paths without a running web application.
+"""
+
+import os
+import random
+
+from score.webassets.versioning import VersionManager
+
+
+class Route:
+
+    def __init__(self, name, urltpl, callback):
+        self.name = name
+        self.urltpl = urltpl
+        self.callback = callback
+        self.url_generator = None
+
+    def vars2url(self, func):
+        self.url_generator = func
+        return func
+
+    def precondition(self, func):
+        return func
+
+
+class Http:
+
+    def __init__(self):
+        self.routes = {}
+
+    def newroute(self, name, urltpl):
+        def decorator(callback):
+            route = Route(name, urltpl, callback)
+            self.routes[name] = route
+            return route
+        return decorator
+
+
+class Webassets:
+
+    def __init__(self, cachedir, versioned=True):
+        self.cachedir = cachedir
+        if versioned:
+            self.versionmanager = VersionManager(
+                os.path.join(cachedir, 'versions'))
+        else:
+            self.versionmanager = NullVersionManager()
+
+
+class NullVersionManager:
+
+    def store(self, category, path, hashers, content_generator):
+        return None
+
+    def create_file_hasher(self, files):
+        return lambda: None
+
+    def handle_request(self, ctx, category, path):
+        return False
+
+
+class Renderer:
+
+    def __init__(self):
+        self.engines = {}
+        self.formats = {}
+        self.functions = {}
+
+    def register_format(self, name, rootdir, cachedir, converter):
+        self.formats[name] = (rootdir, cachedir, converter)
+
+    def format_rootdir(self, format):
+        return self.formats[format][0]
+
+    def format_cachedir(self, format):
+        return self.formats[format][1]
+
+    def add_function(self, format, name, callback, *, escape_output=True):
+        self.functions[(format, name)] = callback
+
+    def paths(self, format, virtassets, includehidden=False):
+        rootdir = self.format_rootdir(format)
+        paths = []
+        for parent, _, files in os.walk(rootdir):
+            for file in files:
+                if not file.endswith('.' + format):
+                    continue
+                file = os.path.join(parent, file)
+                paths.append(os.path.relpath(file, rootdir))
+        if virtassets:
+            paths += list(virtassets.paths())
+        paths.sort()
+        return paths
+
+    def render_file(self, ctx, path, variables=None):
+        file = os.path.join(self.format_rootdir(path.split('.')[1]), path)
+        return open(file, 'r').read()
+
+
+class Tpl:
+
+    def __init__(self):
+        self.renderer = Renderer()
+
+
+class Css:
+
+    def __init__(self):
+        self.virtuals = {}
+
+    def virtcss(self, func):
+        self.virtuals[func.__name__] = func
+        return func
+
+
+class Context:
+
+    def __init__(self, http):
+        self._http = http
+
+    def url(self, route, *args, **kwargs):
+        return self._http.routes[route].url_generator(self, *args, **kwargs)
+
+
+icon_sizes = (16, 24, 32, 48, 64)
+
+
+def generate_icons(folder, count, seed=0):
+    """
+    Writes *count* synthetic svg icons of mixed dimensions and complexity
+    into *folder* and returns their :term:`paths <asset path>`.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        size = rng.choice(icon_sizes)
+        path = 'set%02d/icon%05d.svg' % (i % 16, i)
+        file = os.path.join(folder, path)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        shapes = []
+        for _ in range(rng.randint(1, 12)):
+            points = ' '.join('%d,%d' % (rng.randint(0, size),
+                                         rng.randint(0, size))
+                              for _ in range(rng.randint(3, 24)))
+            shapes.append('  <polygon points="%s" fill="#%06x"/>' %
+                          (points, rng.randint(0, 0xffffff)))
+        open(file, 'w').write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+            'width="%dpx" height="%dpx">\n%s\n</svg>\n' %
+            (size, size, '\n'.join(shapes)))
+        paths.append(path)
+    return paths
@@ -36,6 +36,8 @@ See the :ref:`narrative documentation <svg_toplevel>` for a more in-depth
 documentation of each feature.
 """
 
-from ._init import init, ConfiguredSvgModule
+from ._init import init, ConfiguredSvgModule, RenderLimitExceeded
+from ._metrics import Metrics, SpriteProfile
 
-__all__ = ('init', 'ConfiguredSvgModule')
+__all__ = ('init', 'ConfiguredSvgModule', 'Metrics', 'SpriteProfile',
+           'RenderLimitExceeded')
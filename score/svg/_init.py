@@ -24,18 +24,25 @@
 # the discretion of STRG.AT GmbH also the competent court, in whose district the
 # Licensee has his registered seat, an establishment or assets.
 
-import io
-import json
+import hashlib
+import collections
 import logging
 import os
 import re
-import urllib
-import xml.etree.ElementTree as ET
+import threading
+import time
+import urllib.parse
 
-from score.init import init_cache_folder, ConfiguredModule
+from score.init import (
+    init_cache_folder, ConfiguredModule, extract_conf, parse_bool,
+    parse_object)
 from score.tpl import TemplateConverter
 from score.webassets import VirtualAssets
 
+from ._metrics import Metrics, SpriteProfile
+from .cache import (
+    RenderCache, MemoryCache, DirectoryCache, SharedDirectoryCache)
+
 
 log = logging.getLogger(__name__)
 
@@ -44,6 +51,20 @@ defaults = {
     'rootdir': None,
     'cachedir': None,
     'combine': False,
+    'inline': 0,
+    'metrics': False,
+    'profile': False,
+    'executor': 'thread',
+    'executor.workers': None,
+    'cache': 'local',
+    'cache.folder': None,
+    'sprite_scales': [],
+    'render.max_bytes': 0,
+    'render.max_pixels': 0,
+    'render.timeout': 0,
+    'png.optimize': False,
+    'png.colors': 256,
+    'png.compress_level': 9,
 }
 
 
@@ -66,15 +87,151 @@ def init(confdict, http, webassets, tpl, css):
         A dedicated cache folder for this module. It is generally sufficient
         to provide a ``cachedir`` for :mod:`score.tpl`, as this module will
         use a sub-folder of that by default.
+
+    :confkey:`inline` :faint:`[default=0]`
+        Svg files smaller than this number of bytes will be embedded as
+        ``data:`` URIs into the style sheets generated for :term:`icon elements
+        <icon element>`, saving an HTTP request per icon. The default value of
+        ``0`` disables this feature. Has no effect on :term:`sprites
+        <sprite>`.
+
+    :confkey:`metrics` :faint:`[default=False]`
+        Whether timings and counters of rendering, sprite generation and
+        caching should be collected in the configuration's :attr:`metrics
+        <.ConfiguredSvgModule.metrics>`. Can also be enabled at runtime.
+
+    :confkey:`profile` :faint:`[default=False]`
+        Whether the cost of each icon should be recorded in the configuration's
+        :attr:`profile <.ConfiguredSvgModule.profile>` whenever a
+        :term:`sprite` is built or rasterized. The report is also written to
+        the file ``__profile__.json`` in the ``cachedir``. See
+        :meth:`.ConfiguredSvgModule.profile_sprite` for profiling a sprite
+        on demand.
+
+    :confkey:`executor` :faint:`[default=thread]`
+        The kind of executor the asynchronous rendering functions (like
+        :meth:`.ConfiguredSvgModule.async_render_png`) use for rasterizing svg
+        files: either ``thread`` or ``process``. It is also possible to pass a
+        :class:`concurrent.futures.Executor` instance. The executor is only
+        created once it is first needed.
+
+    :confkey:`executor.workers` :faint:`[default=None]`
+        The maximum number of workers of the executor. The default value
+        leaves the decision to :mod:`concurrent.futures`.
+
+    :confkey:`cache` :faint:`[default=local]`
+        The :class:`score.svg.cache.RenderCache` storing rendered pngs and
+        sprites under the hash of their source content. Valid values are:
+
+        - ``local``: A :class:`score.svg.cache.DirectoryCache` beneath the
+          ``cachedir``. Caching is disabled if there is no ``cachedir``.
+        - ``shared``: A :class:`score.svg.cache.SharedDirectoryCache` in the
+          folder configured as ``cache.folder`` (which is required), which
+          may be shared with other hosts, via NFS for example.
+        - ``memory``: A :class:`score.svg.cache.MemoryCache`.
+        - ``none``: Disables caching.
+
+        Any other value will be converted to an object using
+        :func:`score.init.parse_object`. It is also possible to pass a
+        :class:`score.svg.cache.RenderCache` instance, like a
+        :class:`score.svg.cache.ClientCache` wrapping a Redis client.
+
+    :confkey:`sprite_scales` :faint:`[default=list()]`
+        A list of :ref:`sizes <svg_png_conversion>` (like ``16x16`` or
+        ``200%``), in which additional :term:`sprites <sprite>` should be
+        rendered. Each of these sprites is laid out and rasterized at its
+        native resolution, instead of scaling the original sprite via css.
+        :term:`Icon elements <icon element>` requesting one of these sizes
+        will use the according sprite automatically.
+
+    :confkey:`render.max_bytes` :faint:`[default=0]`
+        Svg files larger than this number of bytes will not be rasterized.
+        The default value of ``0`` disables this limit.
+
+    :confkey:`render.max_pixels` :faint:`[default=0]`
+        The maximum area in pixels of rasterized images, both of the image
+        in its original size and in the requested :ref:`size
+        <svg_png_conversion>`. A value of ``2000000`` would reject images
+        larger than ``2000x1000``, for example. The default value of ``0``
+        disables this limit.
+
+    :confkey:`render.timeout` :faint:`[default=0]`
+        The number of seconds a single rasterization may take. If this value
+        is set, images are rasterized in worker processes, and a worker
+        exceeding this limit is killed. At most :confkey:`executor.workers`
+        (or the number of CPUs) such processes run at the same time. They
+        are started via the ``forkserver``, where available, and reused for
+        following rasterizations. The default value of ``0`` renders in the
+        current process without a time limit.
+
+        The limits on bytes and pixels apply to single icons. A
+        :term:`sprite` is checked icon by icon: it is not rasterized if one
+        of its icons exceeds a limit, no matter how large the sprite is as a
+        whole. The timeout applies to every rasterization, including the one
+        of a whole sprite.
+
+        Images exceeding any of these limits raise a
+        :class:`.RenderLimitExceeded` and the rejection is remembered, so
+        following requests for the same image fail immediately.
+
+    :confkey:`png.optimize` :faint:`[default=False]`
+        Whether rasterized pngs should be optimized using Pillow before they
+        are stored in the :confkey:`cache`. Icons consisting mostly of flat
+        colors are often several times smaller as paletted images. The
+        optimization runs once per cached png and the optimized image is only
+        used if it is actually smaller.
+
+    :confkey:`png.colors` :faint:`[default=256]`
+        The number of colors optimized pngs are quantized to. A value of
+        ``0`` keeps all colors and only recompresses the image.
+
+    :confkey:`png.compress_level` :faint:`[default=9]`
+        The zlib compression level (``0`` to ``9``) of optimized pngs.
+
+    :confkey:`variant.*`
+        Named color variants, like ``variant.danger = #c00``. Each variant
+        recolors the ``fill`` and ``stroke`` of all icons, so a single source
+        file can be delivered in several colors. Pass the name of a variant
+        as *variant* to :meth:`.ConfiguredSvgModule.icon` or the ``icon``
+        template function to use it.
     """
     conf = dict(defaults.items())
     conf.update(confdict)
     if not conf['cachedir'] and webassets.cachedir:
         conf['cachedir'] = os.path.join(webassets.cachedir, 'svg')
     if conf['cachedir']:
-        init_cache_folder(conf, 'cachedir', autopurge=True)
+        init_cache_folder(_purge_conf(conf), 'cachedir', autopurge=True)
+    if isinstance(conf['cache'], RenderCache):
+        cache = conf['cache']
+    elif conf['cache'] == 'local':
+        cache = None
+        if conf['cachedir']:
+            cache = DirectoryCache(os.path.join(conf['cachedir'], 'render'))
+    elif conf['cache'] == 'shared':
+        if not conf['cache.folder']:
+            raise ValueError('Configuration key cache.folder is required '
+                             'for a shared cache')
+        cache = SharedDirectoryCache(conf['cache.folder'])
+    elif conf['cache'] == 'memory':
+        cache = MemoryCache()
+    elif conf['cache'] == 'none':
+        cache = None
+    else:
+        cache = parse_object(conf, 'cache')
     return ConfiguredSvgModule(http, webassets, tpl, css, conf['rootdir'],
-                               conf['combine'], conf['cachedir'])
+                               conf['combine'], conf['cachedir'],
+                               inline=int(conf['inline']),
+                               metrics=parse_bool(conf['metrics']),
+                               profile=parse_bool(conf['profile']),
+                               executor=conf['executor'],
+                               executor_workers=conf['executor.workers'],
+                               render_cache=cache,
+                               sprite_scales=_parse_scales(conf),
+                               variants=_parse_variants(conf),
+                               max_bytes=int(conf['render.max_bytes']),
+                               max_pixels=int(conf['render.max_pixels']),
+                               render_timeout=float(conf['render.timeout']),
+                               png_optimization=_parse_png_optimization(conf))
 
 
 class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
@@ -83,21 +240,58 @@ class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
     <score.init.ConfiguredModule>`.
     """
 
-    def __init__(self, http, webassets, tpl, css, rootdir, combine, cachedir):
+    def __init__(self, http, webassets, tpl, css, rootdir, combine, cachedir,
+                 *, inline=0, metrics=False, profile=False, executor='thread',
+                 executor_workers=None, render_cache=None, sprite_scales=(),
+                 variants=None, max_bytes=0, max_pixels=0, render_timeout=0,
+                 png_optimization=None):
         super().__init__(__package__)
+        self.metrics = Metrics(metrics)
+        self.profile = SpriteProfile(profile)
         self.http = http
         self.webassets = webassets
         self.tpl = tpl
         self.css = css
         tpl.renderer.register_format('svg', rootdir, cachedir, self)
         self.combine = combine
+        self.inline = inline
+        self._datauri_cache = {}
+        if executor_workers:
+            executor_workers = int(executor_workers)
+        self._executor_workers = executor_workers
+        if executor not in ('thread', 'process'):
+            self._executor = executor
+        else:
+            self._executor = None
+            self._executor_kind = executor
+        self._inflight = {}
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.render_timeout = render_timeout
+        self._render_slots = threading.BoundedSemaphore(
+            executor_workers or os.cpu_count() or 1)
+        self._render_workers = []
+        self._render_workers_lock = threading.Lock()
+        self._rejected = collections.OrderedDict()
+        self._rejected_lock = threading.Lock()
+        self._url_sizes = set()
+        self.png_optimization = png_optimization
+        self.render_cache = render_cache
+        self.sprite_scales = tuple(sprite_scales)
+        self.variants = dict(variants or {})
+        self._variant_cache = {}
+        self._source_cache = {}
         self.virtfiles = VirtualAssets()
         self.virtsvg = self.virtfiles.decorator('svg')
+        self._url_cache = {}
         self._add_single_svg_route()
         self._add_single_png_route()
         self._add_single_resized_png_route()
         self._add_combined_svg_route()
         self._add_combined_png_route()
+        self._add_scaled_combined_svg_route()
+        self._add_scaled_combined_png_route()
+        self._add_combined_json_route()
         if self.combine:
             @self.css.virtcss
             def icons(ctx):
@@ -110,54 +304,98 @@ class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
                 styles = [Svg.common_css]
                 for path in self.paths():
                     svg = self.svg(ctx, path)
-                    svgurl = ctx.url('score.svg:single/svg', path)
+                    svgurl = self._inline_url(svg) or \
+                        ctx.url('score.svg:single/svg', path)
                     pngurl = ctx.url('score.svg:single/png', path)
                     styles.append('.icon-%s{%s}' %
                                   (svg.css_class, svg.css(svgurl, pngurl)))
                 return '\n'.join(styles)
 
-    def icon(self, ctx, path, size=None):
+    def icon(self, ctx, path, size=None, variant=None):
+        """
+        Generates the HTML :term:`icon element` for given :term:`path <asset
+        path>`, optionally in another :ref:`size <svg_png_conversion>` and
+        color :ref:`variant <svg_variants>`.
+        """
         if '.' not in path:
             path += '.svg'
+        self._check_variant(variant)
+        if self.combine and (variant or size in self.sprite_scales):
+            styles = self._sprite_css(ctx, path, size, variant)
+            return '<span class="icon icon-%s" style="%s"></span>' % \
+                (Svg.path2css(path), styles)
         if self.combine:
             styles = self.sprite(ctx).svg_css(path, size)
             return '<span class="icon icon-%s" style="%s"></span>' % \
                 (Svg.path2css(path), styles)
-        if path in self.virtfiles.paths():
-            svg = Svg(ctx, path, string=self.virtfiles.render(ctx, path))
-        else:
-            svg = Svg(ctx, path, string=self.render_svg(ctx, path))
-        if not size:
+        svg = self.svg(ctx, path, variant)
+        if not size and not variant:
             return '<span class="icon icon-%s"></span>' % svg.css_class
-        svgurl = ctx.url('score.svg:single/svg', path)
-        pngurl = ctx.url('score.svg:single/png/resized', path, size)
-        styles = svg.css_resized(svgurl, pngurl, size)
+        urlargs = {'variant': variant} if variant else {}
+        svgurl = ctx.url('score.svg:single/svg', path, **urlargs)
+        if size:
+            pngurl = ctx.url('score.svg:single/png/resized', path, size,
+                             **urlargs)
+            styles = svg.css_resized(svgurl, pngurl, size)
+        else:
+            pngurl = ctx.url('score.svg:single/png', path, **urlargs)
+            styles = svg.css(svgurl, pngurl)
         return '<span class="icon icon-%s" style="%s"></span>' % \
             (Svg.path2css(path), styles)
 
-    def icon_css(self, ctx, path, size=None):
+    def icon_css(self, ctx, path, size=None, variant=None):
+        """
+        Same as :meth:`.icon`, but generates the css declarations for
+        rendering the icon inside an arbitrary node.
+        """
         if '.' not in path:
             path += '.svg'
-        if self.combine and not size:
+        self._check_variant(variant)
+        if self.combine and not size and not variant:
             svgurl = ctx.url('score.svg:combined/svg')
             pngurl = ctx.url('score.svg:combined/png')
-            css = self.sprite(ctx).svg_css(path)
-            css += 'background:url(%s)no-repeat;' % pngurl
+            css = 'background:url(%s)no-repeat;' % pngurl
             css += 'background-image:url(%s),none;' % svgurl
+            css += self.sprite(ctx).svg_css(path)
+            css += 'display:inline-block;'
+        elif self.combine and (variant or size in self.sprite_scales):
+            css = self._sprite_css(ctx, path, size, variant)
             css += 'display:inline-block;'
         else:
-            svgurl = ctx.url('score.svg:single/svg', path)
-            pngurl = ctx.url('score.svg:single/png', path)
-            if path in self.virtfiles.paths():
-                svg = Svg(ctx, path, string=self.virtfiles.render(ctx, path))
-            else:
-                svg = Svg(ctx, path, string=self.render_svg(ctx, path))
+            svg = self.svg(ctx, path, variant)
+            urlargs = {'variant': variant} if variant else {}
+            svgurl = self._inline_url(svg) or \
+                ctx.url('score.svg:single/svg', path, **urlargs)
+            pngurl = ctx.url('score.svg:single/png', path, **urlargs)
             if size:
                 return svg.css_resized(svgurl, pngurl, size)
             else:
                 return svg.css(svgurl, pngurl)
         return css
 
+    def _sprite_css(self, ctx, path, size=None, variant=None):
+        """
+        Generates the css for displaying the icon with given :term:`path
+        <asset path>` from a :term:`sprite`. The sprite is rendered natively
+        in given *size*, if it is one of the configured
+        :confkey:`sprite_scales`, and recolored in given *variant*.
+        """
+        urlargs = {'variant': variant} if variant else {}
+        if size in self.sprite_scales:
+            scale, size = size, None
+            svgurl = ctx.url('score.svg:combined/svg/scaled', scale,
+                             **urlargs)
+            pngurl = ctx.url('score.svg:combined/png/scaled', scale,
+                             **urlargs)
+        else:
+            scale = None
+            svgurl = ctx.url('score.svg:combined/svg', **urlargs)
+            pngurl = ctx.url('score.svg:combined/png', **urlargs)
+        css = 'background:url(%s)no-repeat;' % pngurl
+        css += 'background-image:url(%s),none;' % svgurl
+        css += self.sprite(ctx, scale, variant).svg_css(path, size)
+        return css
+
     def _finalize(self, tpl):
         tpl.renderer.add_function('scss', 'icon',
                                   self.icon_css, escape_output=False)
@@ -171,150 +409,357 @@ class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
 
         @self.http.newroute('score.svg:single/svg', '/svg/{path>.*}.svg')
         def single_svg(ctx, path):
-            versionmanager = self.webassets.versionmanager
-            if versionmanager.handle_request(ctx, 'svg', path):
+            variant = self._request_variant(ctx)
+            if self._handle_versioned(ctx, 'svg',
+                                      self._variant_path(path, variant)):
                 return self._svg_response(ctx)
             path = self._urlpath2path(path)
-            svg = self.render_svg(ctx, path)
+            if self._not_modified(ctx, 'single/svg', [path],
+                                  variant=variant):
+                return self._svg_response(ctx)
+            svg = self.render_svg(ctx, path, variant=variant)
             return self._svg_response(ctx, svg)
 
+        @single_svg.precondition
+        def single_svg_precondition(ctx, path):
+            return self._variant_known(ctx)
+
         @single_svg.vars2url
-        def url_single_svg(ctx, path):
+        def url_single_svg(ctx, path, variant=None):
             """
             Generates the url to a single svg :term:`path <asset path>`.
             """
-            urlpath = self._path2urlpath(path)
-            url = '/svg/%s.svg' % urllib.parse.quote(urlpath)
-            renderer = lambda: self.render_svg(ctx, path).encode('UTF-8')
-            versionmanager = self.webassets.versionmanager
-            if path in self.virtfiles.paths():
-                hasher = lambda: self.virtfiles.hash(path)
-            else:
-                file = os.path.join(self.rootdir, path)
-                hasher = versionmanager.create_file_hasher(file)
-            hash_ = versionmanager.store('svg', urlpath, hasher, renderer)
-            if hash_:
-                url += '?_v=' + hash_
-            return url
+            def generate():
+                urlpath = self._path2urlpath(path)
+                url = '/svg/%s.svg' % urllib.parse.quote(urlpath)
+                renderer = lambda: self.render_svg(
+                    ctx, path, variant=variant).encode('UTF-8')
+                versionmanager = self.webassets.versionmanager
+                if path in self.virtfiles.paths():
+                    hasher = lambda: self.virtfiles.hash(ctx, path)
+                else:
+                    file = os.path.join(self.rootdir, path)
+                    hasher = versionmanager.create_file_hasher(file)
+                hash_ = self._store_version(
+                    'svg', urlpath, variant, hasher, renderer)
+                return _add_query(url, variant, hash_)
+            return self._cached_url(ctx, 'single/svg', path, None, generate,
+                                    variant)
 
     def _add_single_png_route(self):
 
         @self.http.newroute('score.svg:single/png', '/svg/{path>.*}.png')
         def single_png(ctx, path):
-            versionmanager = self.webassets.versionmanager
-            if versionmanager.handle_request(ctx, 'png', path):
+            variant = self._request_variant(ctx)
+            versionpath = self._variant_path(
+                os.path.join('auto', path), variant)
+            if self._handle_versioned(ctx, 'png', versionpath):
                 return self._png_response(ctx)
             path = self._urlpath2path(path)
-            png = self.render_png(ctx, path)
-            return self._png_response(ctx, png)
+            if self._not_modified(ctx, 'single/png', [path],
+                                  variant=variant):
+                return self._png_response(ctx)
+            svg = self.svg(ctx, path, variant)
+            return self._rasterized_response(ctx, svg, None)
+
+        @single_png.precondition
+        def single_png_precondition(ctx, path):
+            return self._variant_known(ctx)
 
         @single_png.vars2url
-        def url_single_png(ctx, path):
-            urlpath = self._path2urlpath(path)
-            urlpath = urlpath[:-3] + 'png'
-            url = '/svg/%s.png' % urllib.parse.quote(urlpath)
-            renderer = lambda: self.render_png(ctx, path)
-            versionmanager = self.webassets.versionmanager
-            if path in self.virtfiles.paths():
-                hasher = lambda: self.virtfiles.hash(path)
-            else:
-                file = os.path.join(self.rootdir, path)
-                hasher = versionmanager.create_file_hasher(file)
-            hash_ = versionmanager.store('png', os.path.join('auto', urlpath),
-                                         hasher, renderer)
-            if hash_:
-                url += '?_v=' + hash_
-            return url
+        def url_single_png(ctx, path, variant=None):
+            def generate():
+                urlpath = self._path2urlpath(path)
+                url = '/svg/%s.png' % urllib.parse.quote(urlpath)
+                renderer = lambda: self.render_png(ctx, path, variant=variant)
+                versionmanager = self.webassets.versionmanager
+                if path in self.virtfiles.paths():
+                    hasher = lambda: self.virtfiles.hash(ctx, path)
+                else:
+                    file = os.path.join(self.rootdir, path)
+                    hasher = versionmanager.create_file_hasher(file)
+                hash_ = self._store_version(
+                    'png', os.path.join('auto', urlpath), variant,
+                    hasher, renderer)
+                return _add_query(url, variant, hash_)
+            return self._cached_url(ctx, 'single/png', path, None, generate,
+                                    variant)
 
     def _add_single_resized_png_route(self):
 
         @self.http.newroute('score.svg:single/png/resized',
                             '/svg/{size}/{path>.*}.png')
         def single_png_resized(ctx, path, size):
-            versionmanager = self.webassets.versionmanager
-            if versionmanager.handle_request(ctx, 'png',
-                                             os.path.join(size, path)):
+            variant = self._request_variant(ctx)
+            versionpath = self._variant_path(
+                os.path.join(size, path), variant)
+            if self._handle_versioned(ctx, 'png', versionpath):
                 return self._png_response(ctx)
             path = self._urlpath2path(path)
-            png = self.render_png(ctx, path, size)
-            return self._png_response(ctx, png)
+            if self._not_modified(ctx, 'single/png/resized', [path], size,
+                                  variant=variant):
+                return self._png_response(ctx)
+            svg = self.svg(ctx, path, variant)
+            return self._rasterized_response(ctx, svg, size)
+
+        @single_png_resized.precondition
+        def single_png_resized_precondition(ctx, path, size):
+            return self._variant_known(ctx)
 
         @single_png_resized.vars2url
-        def url_single_png_resized(ctx, path, size):
-            urlpath = self._path2urlpath(path)
-            urlpath = urlpath[:-3] + 'png'
-            url = '/svg/%s/%s.png' % (urllib.parse.quote(size),
-                                      urllib.parse.quote(urlpath))
-            renderer = lambda: self.render_png(ctx, path, size)
-            versionmanager = self.webassets.versionmanager
-            if path in self.virtfiles.paths():
-                hasher = lambda: self.virtfiles.hash(path)
-            else:
-                file = os.path.join(self.rootdir, path)
-                hasher = versionmanager.create_file_hasher(file)
-            hash_ = versionmanager.store('png', os.path.join(size, urlpath),
-                                         hasher, renderer)
-            if hash_:
-                url += '?_v=' + hash_
-            return url
+        def url_single_png_resized(ctx, path, size, variant=None):
+            self._url_sizes.add(size)
+
+            def generate():
+                urlpath = self._path2urlpath(path)
+                url = '/svg/%s/%s.png' % (urllib.parse.quote(size),
+                                          urllib.parse.quote(urlpath))
+                renderer = lambda: self.render_png(
+                    ctx, path, size, variant=variant)
+                versionmanager = self.webassets.versionmanager
+                if path in self.virtfiles.paths():
+                    hasher = lambda: self.virtfiles.hash(ctx, path)
+                else:
+                    file = os.path.join(self.rootdir, path)
+                    hasher = versionmanager.create_file_hasher(file)
+                hash_ = self._store_version(
+                    'png', os.path.join(size, urlpath), variant,
+                    hasher, renderer)
+                return _add_query(url, variant, hash_)
+            return self._cached_url(ctx, 'single/png/resized', path, size,
+                                    generate, variant)
 
     def _add_combined_svg_route(self):
 
         @self.http.newroute('score.svg:combined/svg', '/combined.svg')
         def svg_combined(ctx):
-            versionmanager = self.webassets.versionmanager
-            if versionmanager.handle_request(ctx, 'svg', '__combined__'):
+            variant = self._request_variant(ctx)
+            name = self._variant_path('__combined__', variant)
+            if self._handle_versioned(ctx, 'svg', name):
+                return self._svg_response(ctx)
+            if self._not_modified(ctx, 'combined/svg', self.paths(),
+                                  variant=variant):
                 return self._svg_response(ctx)
-            return self._svg_response(ctx, self.render_svg_sprite(ctx))
+            return self._sprite_response(ctx, self.sprite(ctx, None, variant))
+
+        @svg_combined.precondition
+        def svg_combined_precondition(ctx):
+            return self._variant_known(ctx)
 
         @svg_combined.vars2url
-        def url_svg_combined(ctx):
-            url = '/combined.svg'
-            files = []
-            vfiles = []
-            for path in self.paths():
-                if path in self.virtfiles.paths():
-                    vfiles.append(path)
-                else:
-                    files.append(os.path.join(self.rootdir, path))
-            versionmanager = self.webassets.versionmanager
-            hashers = [versionmanager.create_file_hasher(files)]
-            hashers += [lambda path: self.virtfiles.hash(path) for path in vfiles]
-            hash_ = versionmanager.store(
-                'svg', '__combined__', hashers,
-                lambda: self.render_svg_sprite(ctx).encode('UTF-8'))
-            if hash_:
-                url += '?_v=' + hash_
-            return url
+        def url_svg_combined(ctx, variant=None):
+            return self._combined_url(
+                ctx, 'svg', '/combined.svg', '__combined__', variant,
+                lambda: self.render_svg_sprite(
+                    ctx, variant=variant).encode('UTF-8'))
 
     def _add_combined_png_route(self):
 
         @self.http.newroute('score.svg:combined/png', '/combined.png')
         def png_combined(ctx):
-            versionmanager = self.webassets.versionmanager
-            if versionmanager.handle_request(ctx, 'png', '__combined__'):
-                return self.png_response(ctx)
-            return self.png_response(ctx, self.render_png_sprite(ctx))
+            variant = self._request_variant(ctx)
+            name = self._variant_path('__combined__', variant)
+            if self._handle_versioned(ctx, 'png', name):
+                return self._png_response(ctx)
+            if self._not_modified(ctx, 'combined/png', self.paths(),
+                                  variant=variant):
+                return self._png_response(ctx)
+            sprite = self.sprite(ctx, None, variant)
+            return self._rasterized_response(ctx, sprite, None)
+
+        @png_combined.precondition
+        def png_combined_precondition(ctx):
+            return self._variant_known(ctx)
 
         @png_combined.vars2url
-        def url_png_combined(ctx):
-            url = '/combined.png'
-            files = []
-            vfiles = []
-            for path in self.paths():
-                if path in self.virtfiles.paths():
-                    vfiles.append(path)
-                else:
-                    files.append(os.path.join(self.rootdir, path))
-            versionmanager = self.webassets.versionmanager
-            hashers = [versionmanager.create_file_hasher(files)]
-            hashers += [lambda path: self.virtfiles.hash(path) for path in vfiles]
-            hash_ = versionmanager.store(
-                'png', '__combined__', hashers,
-                lambda: self.render_svg_sprite(ctx).encode('UTF-8'))
-            if hash_:
-                url += '?_v=' + hash_
-            return url
+        def url_png_combined(ctx, variant=None):
+            return self._combined_url(
+                ctx, 'png', '/combined.png', '__combined__', variant,
+                lambda: self.render_png_sprite(ctx, variant=variant))
+
+    def _add_combined_json_route(self):
+
+        @self.http.newroute('score.svg:combined/json', '/combined.json')
+        def json_combined(ctx):
+            if self._handle_versioned(ctx, 'json', '__combined__'):
+                return self._json_response(ctx)
+            if self._not_modified(ctx, 'combined/json', self.paths()):
+                return self._json_response(ctx)
+            return self._json_response(ctx, self.render_sprite_manifest(ctx))
+
+        @json_combined.vars2url
+        def url_json_combined(ctx):
+            return self._combined_url(
+                ctx, 'json', '/combined.json', '__combined__', None,
+                lambda: self.render_sprite_manifest(ctx).encode('UTF-8'))
+
+    def _add_scaled_combined_svg_route(self):
+
+        @self.http.newroute('score.svg:combined/svg/scaled',
+                            '/combined/{scale}.svg')
+        def svg_combined_scaled(ctx, scale):
+            variant = self._request_variant(ctx)
+            name = self._variant_path('__combined__@' + scale, variant)
+            if self._handle_versioned(ctx, 'svg', name):
+                return self._svg_response(ctx)
+            if self._not_modified(ctx, 'combined/svg', self.paths(), scale,
+                                  variant=variant):
+                return self._svg_response(ctx)
+            return self._sprite_response(
+                ctx, self.sprite(ctx, scale, variant))
+
+        @svg_combined_scaled.precondition
+        def svg_combined_scaled_precondition(ctx, scale):
+            return scale in self.sprite_scales and \
+                self._variant_known(ctx)
+
+        @svg_combined_scaled.vars2url
+        def url_svg_combined_scaled(ctx, scale, variant=None):
+            return self._combined_url(
+                ctx, 'svg', '/combined/%s.svg' % urllib.parse.quote(scale),
+                '__combined__@' + scale, variant,
+                lambda: self.render_svg_sprite(
+                    ctx, scale=scale, variant=variant).encode('UTF-8'))
+
+    def _add_scaled_combined_png_route(self):
+
+        @self.http.newroute('score.svg:combined/png/scaled',
+                            '/combined/{scale}.png')
+        def png_combined_scaled(ctx, scale):
+            variant = self._request_variant(ctx)
+            name = self._variant_path('__combined__@' + scale, variant)
+            if self._handle_versioned(ctx, 'png', name):
+                return self._png_response(ctx)
+            if self._not_modified(ctx, 'combined/png', self.paths(), scale,
+                                  variant=variant):
+                return self._png_response(ctx)
+            sprite = self.sprite(ctx, scale, variant)
+            return self._rasterized_response(ctx, sprite, None)
+
+        @png_combined_scaled.precondition
+        def png_combined_scaled_precondition(ctx, scale):
+            return scale in self.sprite_scales and \
+                self._variant_known(ctx)
+
+        @png_combined_scaled.vars2url
+        def url_png_combined_scaled(ctx, scale, variant=None):
+            return self._combined_url(
+                ctx, 'png', '/combined/%s.png' % urllib.parse.quote(scale),
+                '__combined__@' + scale, variant,
+                lambda: self.render_png_sprite(
+                    ctx, scale=scale, variant=variant))
+
+    def _combined_url(self, ctx, category, url, name, variant, renderer):
+        """
+        Stores the :term:`sprite` generated by *renderer* in the
+        versionmanager under given *category* and *name* and returns the *url*
+        with the *variant* and the version string attached.
+        """
+        versionmanager = self.webassets.versionmanager
+        files = []
+        hashers = []
+        for path in self.paths():
+            if path in self.virtfiles.paths():
+                hashers.append(
+                    lambda path=path: self.virtfiles.hash(ctx, path))
+            else:
+                files.append(os.path.join(self.rootdir, path))
+        hashers.insert(0, versionmanager.create_file_hasher(files))
+        hash_ = self._store_version(
+            category, name, variant, hashers, renderer)
+        return _add_query(url, variant, hash_)
+
+    def _fingerprint(self, ctx, path):
+        """
+        Returns a cheap string that changes whenever the content of the asset
+        with given :term:`path <asset path>` changes.
+        """
+        if path in self.virtfiles.paths():
+            return self.virtfiles.hash(ctx, path)
+        stat = os.stat(os.path.join(self.rootdir, path))
+        return '%x-%x' % (stat.st_mtime_ns, stat.st_size)
+
+    def _cached_url(self, ctx, route, path, size, generator, variant=None):
+        """
+        Returns the url generated by *generator* for given *route*, *path*,
+        *size* and *variant*. The *generator* is only invoked if the asset's
+        :meth:`fingerprint <._fingerprint>` changed since the last call.
+        """
+        key = (route, path, size, variant)
+        fingerprint = self._fingerprint(ctx, path)
+        try:
+            cached_fingerprint, url = self._url_cache[key]
+            if cached_fingerprint == fingerprint:
+                self.metrics.incr('url.cache.hit')
+                return url
+        except KeyError:
+            pass
+        self.metrics.incr('url.cache.miss')
+        url = generator()
+        self._url_cache[key] = (fingerprint, url)
+        return url
+
+    def _inline_url(self, svg):
+        """
+        Returns a ``data:`` URI of the given :class:`.Svg`, if its content is
+        smaller than the configured :confkey:`inline` threshold, or `None`
+        otherwise. Generated URIs are cached by content hash.
+        """
+        if not self.inline:
+            return None
+        content = svg.content.encode('UTF-8')
+        if len(content) >= self.inline:
+            return None
+        key = hashlib.sha256(content).hexdigest()
+        try:
+            return self._datauri_cache[key]
+        except KeyError:
+            pass
+        uri = svg2datauri(svg)
+        self._datauri_cache[key] = uri
+        return uri
+
+    def _store_version(self, category, path, variant, hashers,
+                       content_generator):
+        """
+        Passes its arguments to the versionmanager's
+        :meth:`score.webassets.versioning.VersionManager.store`. The *variant*
+        is appended to the *path* and its color is added to the *hashers*, so
+        the version string changes along with the color of a variant.
+
+        Returns `None` if the content exceeds the configured render limits:
+        the url of such an asset has no version and requests for it are
+        rejected by its route, while all other assets remain usable.
+        """
+        if variant:
+            if not hasattr(hashers, '__iter__'):
+                hashers = hashers,
+            hashers = list(hashers)
+            hashers.append(lambda: self._variant_suffix(variant))
+        try:
+            with self.metrics.timer('versionmanager.store'):
+                return self.webassets.versionmanager.store(
+                    category, self._variant_path(path, variant), hashers,
+                    content_generator)
+        except RenderLimitExceeded as e:
+            log.warning('Not versioning %s: %s' % (path, e))
+            return None
+
+    def _sources_hash(self, ctx, paths):
+        """
+        Returns a hash of the source content of all given :term:`paths
+        <asset path>`. Unlike :meth:`._fingerprint`, this value is the same on
+        all hosts.
+        """
+        sha = hashlib.sha256()
+        for path in paths:
+            sha.update(path.encode('UTF-8') + b'\0')
+            if path in self.virtfiles.paths():
+                sha.update(self.virtfiles.hash(ctx, path).encode('UTF-8'))
+            else:
+                with open(os.path.join(self.rootdir, path), 'rb') as file:
+                    sha.update(hashlib.sha256(file.read()).digest())
+        return sha.hexdigest()
 
     def _path2urlpath(self, path):
         """
@@ -344,26 +789,274 @@ class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
                 return svgpath + '.' + ext
         raise ValueError('Could not determine path for url "%s"' % urlpath)
 
-    def _svg_response(self, ctx, svg=None):
+    def _not_modified(self, ctx, route, paths, size=None, variant=None):
+        """
+        Sets the ``ETag`` and ``Last-Modified`` headers for the asset rendered
+        by *route* from given :term:`paths <asset path>` (in given *size* and
+        *variant*) and returns whether
+        the client already has this version of the asset. The response status
+        will be set to 304 in that case, allowing the caller to skip rendering
+        altogether.
+
+        The ETag is derived from the same :meth:`fingerprints
+        <._fingerprint>` used for url generation, so no content needs to be
+        rendered for determining it.
+        """
+        sha = hashlib.sha256()
+        sha.update(('%s\0%s\0%s' % (
+            route, size, self._variant_suffix(variant))).encode('UTF-8'))
+        mtimes = []
+        for path in paths:
+            sha.update(('\0%s\0%s' % (
+                path, self._fingerprint(ctx, path))).encode('UTF-8'))
+            if path not in self.virtfiles.paths():
+                mtimes.append(os.path.getmtime(
+                    os.path.join(self.rootdir, path)))
+        request = ctx.http.request
+        response = ctx.http.response
+        response.etag = sha.hexdigest()
+        if mtimes and len(mtimes) == len(paths):
+            response.last_modified = int(max(mtimes))
+        if 'If-None-Match' in request.headers:
+            modified = response.etag not in request.if_none_match
+        elif request.if_modified_since and response.last_modified:
+            modified = response.last_modified > request.if_modified_since
+        else:
+            modified = True
+        if not modified:
+            response.status = 304
+        return not modified
+
+    def _variant_suffix(self, variant):
+        """
+        Returns the string identifying given *variant* in the names of stored
+        files. It contains a hash of the variant's color, so changing the
+        color of a variant will create new versions of all affected assets.
+        """
+        if not variant:
+            return ''
+        color = self.variants[variant].encode('UTF-8')
+        return '~%s-%s' % (variant, hashlib.sha256(color).hexdigest()[:8])
+
+    def _variant_path(self, path, variant):
+        """
+        Appends the *variant* to a *path* stored in the versionmanager.
+        """
+        return path + self._variant_suffix(variant)
+
+    def _request_variant(self, ctx):
+        """
+        Returns the name of the variant requested via the ``variant`` GET
+        parameter of the current request, or `None`.
+        """
+        return ctx.http.request.GET.get('variant') or None
+
+    def _variant_known(self, ctx):
+        """
+        Route precondition ensuring that the :meth:`requested variant
+        <._request_variant>` is configured.
+        """
+        variant = self._request_variant(ctx)
+        return variant is None or variant in self.variants
+
+    def _check_variant(self, variant):
+        if variant is not None and variant not in self.variants:
+            raise ValueError('Variant not configured: ' + variant)
+
+    def _recolor(self, content, variant):
+        """
+        Returns given svg *content* in the color of given *variant*. Results
+        are cached by content hash and color.
+        """
+        if not variant:
+            return content
+        self._check_variant(variant)
+        color = self.variants[variant]
+        key = (hashlib.sha256(content.encode('UTF-8')).digest(), color)
+        try:
+            result = self._variant_cache[key]
+            self.metrics.incr('variant.cache.hit')
+            return result
+        except KeyError:
+            pass
+        self.metrics.incr('variant.cache.miss')
+        with self.metrics.timer('recolor'):
+            result = recolor(content, color)
+        self._variant_cache[key] = result
+        return result
+
+    def _handle_versioned(self, ctx, category, path):
+        """
+        Lets the versionmanager's
+        :meth:`score.webassets.versioning.VersionManager.handle_request`
+        answer requests for a version of an asset. Versions found in the
+        versionmanager's folder are :meth:`streamed <._send_file>` from there
+        instead of being read into memory, which also adds support for
+        requests of byte ranges.
+
+        The conditional headers ``If-None-Match`` and ``If-Modified-Since``
+        are hidden from the versionmanager, which fails on anything but a
+        single strong ETag and on dates. Conditional requests for a version
+        are answered by webob's conditional response handling instead, all
+        others by :meth:`._not_modified`.
+        """
+        request = ctx.http.request
+        versionmanager = self.webassets.versionmanager
+        version = request.GET.get('_v')
+        file = version and self._version_file(category, path, version)
+        if file:
+            self._send_file(ctx, file)
+            ctx.http.response.etag = version
+            return True
+        environ = request.environ
+        conditions = {}
+        for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE'):
+            if header in environ:
+                conditions[header] = environ.pop(header)
+        try:
+            handled = versionmanager.handle_request(ctx, category, path)
+        finally:
+            environ.update(conditions)
+        if handled:
+            ctx.http.response.conditional_response = True
+        return handled
+
+    def _version_file(self, category, path, version):
+        """
+        Returns the file storing given *version* of an asset, or `None` if
+        there is no such file. As :mod:`score.webassets` has no public api
+        for this lookup, this relies on the internals of its
+        :class:`score.webassets.versioning.VersionManager` and always
+        returns `None` for other versionmanager implementations.
+        """
+        versionmanager = self.webassets.versionmanager
+        try:
+            folder = versionmanager.folder
+            hashregex = versionmanager.hashregex
+            cache_file = versionmanager._cache_file
+        except AttributeError:
+            return None
+        if not folder or not hashregex.match(version):
+            return None
+        file = cache_file(category, path, version)
+        if not os.path.isfile(file):
+            return None
+        return file
+
+    def _cache_headers(self, ctx):
+        """
+        Marks responses to versioned urls as immutable. Such urls contain the
+        hash of the asset's content in the ``_v`` GET parameter, which the
+        versionmanager also uses as ETag when it successfully handles a
+        request.
+        """
+        version = ctx.http.request.GET.get('_v')
+        if version and ctx.http.response.etag == version:
+            ctx.http.response.headers['Cache-Control'] = \
+                'public, max-age=%d, immutable' % (60 * 60 * 24 * 365)
+
+    def _svg_response(self, ctx, svg=None, *, file=None):
         """
         Sets appropriate headers on the http response.
-        Will optionally set the response body to the given *svg* string.
+        Will optionally set the response body to the given *svg* string, or
+        stream it from given *file*.
         """
         ctx.http.response.content_type = 'image/svg+xml; charset=UTF-8'
-        if svg:
+        self._cache_headers(ctx)
+        if file:
+            self._send_file(ctx, file)
+        elif svg:
             ctx.http.response.text = svg
+            ctx.http.response.conditional_response = True
         return ctx.http.response
 
-    def _png_response(self, ctx, png=None):
+    def _png_response(self, ctx, png=None, *, file=None):
         """
         Sets appropriate headers on the http response.
-        Will optionally set the response body to the given *png* bytes.
+        Will optionally set the response body to the given *png* bytes, or
+        stream it from given *file*.
         """
         ctx.http.response.content_type = 'image/png'
-        if png:
+        self._cache_headers(ctx)
+        if file:
+            self._send_file(ctx, file)
+        elif png:
             ctx.http.response.body = png
+            ctx.http.response.conditional_response = True
         return ctx.http.response
 
+    def _json_response(self, ctx, json=None):
+        """
+        Sets appropriate headers on the http response.
+        Will optionally set the response body to the given *json* string.
+        """
+        ctx.http.response.content_type = 'application/json; charset=UTF-8'
+        self._cache_headers(ctx)
+        if json:
+            ctx.http.response.text = json
+            ctx.http.response.conditional_response = True
+        return ctx.http.response
+
+    def _send_file(self, ctx, file):
+        """
+        Makes the http response stream the content of given *file*. The file
+        is passed to the server's ``wsgi.file_wrapper``, if available, which
+        may send it without copying it through python (via ``sendfile()``, for
+        example). Requests for byte ranges are answered with a
+        :class:`webob.static.FileIter`, which can seek within the file.
+        """
+        from webob.static import FileIter, BLOCK_SIZE
+        request = ctx.http.request
+        response = ctx.http.response
+        fp = open(file, 'rb')
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if file_wrapper and not request.range:
+            response.app_iter = file_wrapper(fp, BLOCK_SIZE)
+        else:
+            response.app_iter = FileIter(fp)
+        # setting the app_iter resets the content length
+        response.content_length = os.fstat(fp.fileno()).st_size
+        response.accept_ranges = 'bytes'
+        response.conditional_response = True
+        self.metrics.incr('response.file')
+
+    def _sprite_response(self, ctx, sprite):
+        """
+        Responds with the svg content of given :class:`.Sprite`, streaming it
+        from the sprite's cache file, if there is one.
+        """
+        file = sprite.file
+        if file:
+            return self._svg_response(ctx, file=file)
+        return self._svg_response(ctx, sprite.content)
+
+    def _rasterized_response(self, ctx, svg, size):
+        """
+        Responds with the png rendering of given :class:`.Svg` or
+        :class:`.Sprite`. Pngs found in a :attr:`.render_cache` storing its
+        blobs in the local file system are streamed from there, all others
+        are :meth:`rasterized <._rasterize>`. The result is only stored in
+        the render cache if the *size* was passed to a url generator of this
+        module before, so clients cannot fill the cache with arbitrary sizes.
+        """
+        persist = not size or size in self._url_sizes
+        size = _pixel_size(svg, size)
+        if self.render_cache is not None:
+            key = self._png_cache_key(svg.content, size)
+            file = self.render_cache.file(key)
+            if file:
+                self.metrics.incr('render_cache.hit')
+                return self._png_response(ctx, file=file)
+        try:
+            with self.metrics.timer('render_png'):
+                png = self._rasterize(svg, size, persist=persist)
+        except RenderLimitExceeded as e:
+            log.warning('Not rasterizing %s: %s' % (
+                getattr(svg, 'path', None) or 'sprite', e))
+            ctx.http.response.status = 422
+            return ctx.http.response
+        return self._png_response(ctx, png)
+
     @property
     def rootdir(self):
         """
@@ -386,51 +1079,508 @@ class ConfiguredSvgModule(ConfiguredModule, TemplateConverter):
         """
         return self.tpl.renderer.paths('svg', self.virtfiles, includehidden)
 
-    def sprite(self, ctx):
+    def sprite(self, ctx, scale=None, variant=None):
         """
-        Provides the :class:`.Sprite` object for this configuration.
+        Provides the :class:`.Sprite` object for this configuration. If a
+        *scale* is given, it must be one of the configured
+        :confkey:`sprite_scales`. The optional *variant* must be the name of
+        a configured :confkey:`variant <variant.*>`.
         """
-        return Sprite(ctx, self)
+        if scale is not None and scale not in self.sprite_scales:
+            raise ValueError('Sprite scale not configured: ' + scale)
+        self._check_variant(variant)
+        return Sprite(ctx, self, scale, variant)
 
-    def svg(self, ctx, path):
+    def svg(self, ctx, path, variant=None):
         """
-        Provides an :class:`.Svg` object for given path. Caching behaviour is
-        the same as in :attr:`.sprite`.
+        Provides an :class:`.Svg` object for given path, recolored in given
+        *variant*. Caching behaviour is the same as in :attr:`.sprite`.
         """
-        if path.endswith('.svg'):
-            return Svg(ctx, path, file=os.path.join(self.rootdir, path))
-        return Svg(ctx, path, string=self.tpl.renderer.render_file(ctx, path))
+        content = self._recolor(self._source(ctx, path), variant)
+        return Svg(ctx, path, string=content)
 
-    def render_svg(self, ctx, path):
+    def _source(self, ctx, path):
+        """
+        Returns the content of the asset with given :term:`path <asset
+        path>`. Static ``.svg`` files do not need to pass the template
+        renderer: they are read directly and kept in memory until their
+        modification time or size changes. Only templates (like
+        ``arrow.svg.jinja2``) and :term:`virtual assets <virtual asset>` are
+        rendered.
+        """
+        if path in self.virtfiles.paths():
+            return self.virtfiles.render(ctx, path)
+        if not path.endswith('.svg'):
+            with self.metrics.timer('render_file'):
+                return self.tpl.renderer.render_file(ctx, path)
+        file = os.path.join(self.rootdir, path)
+        stat = os.stat(file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        try:
+            cached_version, content = self._source_cache[path]
+            if cached_version == version:
+                self.metrics.incr('source.cache.hit')
+                return content
+        except KeyError:
+            pass
+        self.metrics.incr('source.cache.miss')
+        with open(file, 'r') as fp:
+            content = fp.read()
+        self._source_cache[path] = (version, content)
+        return content
+
+    def render_svg(self, ctx, path, *, variant=None):
         """
-        Retuns the content of the file denoted by :term:`path <asset path>`.
+        Retuns the content of the file denoted by :term:`path <asset path>`,
+        recolored in given *variant*.
         """
-        return self.svg(ctx, path).content
+        with self.metrics.timer('render_svg'):
+            return self.svg(ctx, path, variant).content
 
-    def render_png(self, ctx, path, size=None):
+    def render_png(self, ctx, path, size=None, *, variant=None):
         """
         Renders the svg file with given :term:`path <asset path>` in the
         Portable Network Graphics (png) file format.
         """
-        return svg2png(self.svg(ctx, path), size)
+        with self.metrics.timer('render_png'):
+            return self._rasterize(self.svg(ctx, path, variant), size)
 
-    def render_svg_sprite(self, ctx):
+    def render_svg_sprite(self, ctx, *, scale=None, variant=None):
         """
         Renders the :term:`sprite` of this configuration in the svg file
-        format.
+        format. The optional *scale* must be one of the configured
+        :confkey:`sprite_scales`, the optional *variant* the name of a
+        configured :confkey:`variant <variant.*>`.
         """
-        return self.sprite(ctx).content
+        return self.sprite(ctx, scale, variant).content
 
-    def render_png_sprite(self, ctx, size=None):
+    def render_png_sprite(self, ctx, size=None, *, scale=None, variant=None):
         """
         Same as :meth:`.render_svg_sprite`, but returns a png, thus a `bytes`
         object.
         """
-        return svg2png(self.sprite(ctx), size)
+        with self.metrics.timer('render_png_sprite'):
+            sprite = self.sprite(ctx, scale, variant)
+            if self.profile.enabled:
+                self._profile_rasterization(ctx, sprite)
+            return self._rasterize(sprite, size)
+
+    def profile_sprite(self, ctx, *, scale=None, variant=None,
+                       rasterize=False):
+        """
+        Builds the :term:`sprite` with given *scale* and *variant* from
+        scratch, while recording the cost of each icon in a new
+        :class:`score.svg.SpriteProfile`, even if the :confkey:`profile`
+        configuration key is disabled. Will also rasterize each icon on its
+        own, if *rasterize* is `True`.
+
+        Returns the :meth:`entries <score.svg.SpriteProfile.entries>` of
+        the profile, which are also written to the file ``__profile__.json``
+        in the ``cachedir``.
+        """
+        if scale is not None and scale not in self.sprite_scales:
+            raise ValueError('Sprite scale not configured: ' + scale)
+        self._check_variant(variant)
+        profile = SpriteProfile(True)
+        sprite = Sprite(ctx, self, scale, variant, rebuild=True,
+                        profile=profile)
+        # the content is probably still in the render cache
+        sprite._generate_content()
+        if rasterize:
+            self._profile_rasterization(ctx, sprite)
+        else:
+            self._write_profile(profile)
+        return profile.entries()
+
+    def _profile_rasterization(self, ctx, sprite):
+        """
+        Rasterizes each icon of given :class:`.Sprite` on its own, recording
+        the durations in the sprite's profile. The rasterizations are subject
+        to the same limits as all others.
+        """
+        for path in self.paths():
+            if path in sprite.svg_aliases:
+                continue
+            icon = (path, sprite.scale, sprite.variant)
+            svg = self.svg(ctx, path, sprite.variant)
+            try:
+                content = svg.content
+                size = _pixel_size(svg, sprite.scale)
+                key = self._png_cache_key(content, size)
+                self._check_limits(svg, content, size, key)
+                with sprite.profile.timer(icon, 'rasterize'):
+                    if not self.render_timeout:
+                        svg2png(svg, size)
+                    else:
+                        try:
+                            self._svg2png_timed(content, size)
+                        except RenderLimitExceeded as e:
+                            self._reject(key, e, timeout=True)
+                            raise
+            except Exception as e:
+                sprite.profile.record(icon, 'error', str(e))
+        self._write_profile(sprite.profile)
+
+    def _write_profile(self, profile):
+        """
+        Writes given :class:`score.svg.SpriteProfile` into the ``cachedir``,
+        if it is enabled.
+        """
+        if profile.enabled and self.cachedir:
+            profile.write(os.path.join(self.cachedir, '__profile__.json'))
+
+    def render_sprite_manifest(self, ctx, *, scale=None):
+        """
+        Renders the layout of the :term:`sprite` as a JSON document, allowing
+        clients to position the icons themselves. It contains the urls and
+        dimensions of the sprite and the dimensions of each icon, as well as
+        the position ``x`` of its left edge within the sprite::
+
+            {
+              "width": 30, "height": 20,
+              "svg": "/combined.svg?_v=...", "png": "/combined.png?_v=...",
+              "icons": {
+                "arrow": {"path": "arrow.svg", "x": 0,
+                          "width": 10, "height": 20},
+                "close": {"path": "close.svg", "x": 10,
+                          "width": 20, "height": 20},
+                ...
+              }
+            }
+
+        The optional *scale* must be one of the configured
+        :confkey:`sprite_scales`.
+        """
+        import json
+        if scale:
+            svgurl = ctx.url('score.svg:combined/svg/scaled', scale)
+            pngurl = ctx.url('score.svg:combined/png/scaled', scale)
+        else:
+            svgurl = ctx.url('score.svg:combined/svg')
+            pngurl = ctx.url('score.svg:combined/png')
+        manifest = self.sprite(ctx, scale).manifest()
+        manifest['svg'] = svgurl
+        manifest['png'] = pngurl
+        return json.dumps(manifest, sort_keys=True, separators=(',', ':'))
+
+    def _rasterize(self, svg, size, *, persist=True):
+        """
+        Converts given :class:`.Svg` or :class:`.Sprite` to png, consulting the
+        :attr:`render cache <.render_cache>` first. The png is stored in the
+        render cache, unless *persist* is `False`.
+        """
+        size = _pixel_size(svg, size)
+        content = svg.content
+        key = self._png_cache_key(content, size)
+        png = self._cache_get(key)
+        if png is not None:
+            return png
+        self._check_limits(svg, content, size, key)
+        try:
+            with self.metrics.timer('svg2png'):
+                if self.render_timeout:
+                    png = self._svg2png_timed(content, size)
+                else:
+                    png = svg2png(svg, size)
+        except RenderLimitExceeded as e:
+            self._reject(key, e, timeout=True)
+            raise
+        if self.png_optimization:
+            with self.metrics.timer('optimize_png'):
+                optimized = optimize_png(png, *self.png_optimization)
+            png = self._optimized(svg, png, optimized)
+        if persist:
+            self._cache_set(key, png)
+        return png
+
+    def _optimized(self, svg, png, optimized):
+        """
+        Reports the savings of an :func:`optimized <.optimize_png>` version of
+        given *png* and returns the smaller one of both.
+        """
+        saved = len(png) - len(optimized)
+        log.debug('Optimized png of %s: %d -> %d bytes' % (
+            getattr(svg, 'path', None) or 'sprite', len(png), len(optimized)))
+        self.metrics.incr('png.optimize.bytes_in', len(png))
+        if saved <= 0:
+            self.metrics.incr('png.optimize.bytes_out', len(png))
+            return png
+        self.metrics.incr('png.optimize.bytes_out', len(optimized))
+        return optimized
+
+    def _check_limits(self, svg, content, size, key):
+        """
+        Raises a :class:`.RenderLimitExceeded` if given :class:`.Svg` or
+        :class:`.Sprite` with given *content* would exceed the configured
+        limits when rendered in given *size*, or if the png with given
+        :meth:`render cache key <._png_cache_key>` was rejected before.
+        """
+        rejected = self._rejection(key)
+        if rejected is None and self.render_cache is not None:
+            rejected = self.render_cache.get(self._rejected_key(key))
+            if rejected is not None:
+                rejected = rejected.decode('UTF-8')
+                self._remember_rejection(key, rejected, None)
+        if rejected is not None:
+            self.metrics.incr('render.rejected.cached')
+            raise RenderLimitExceeded(rejected)
+        try:
+            if isinstance(svg, Sprite):
+                self._check_sprite_limits(svg, size)
+            else:
+                self._check_svg_limits(svg, content, size)
+        except RenderLimitExceeded as e:
+            self._reject(key, e)
+            raise
+
+    def _check_svg_limits(self, svg, content, size):
+        """
+        Raises a :class:`.RenderLimitExceeded` if given :class:`.Svg` with
+        given *content* exceeds the configured limits in given *size*.
+        """
+        if self.max_bytes and len(content.encode('UTF-8')) > self.max_bytes:
+            raise RenderLimitExceeded(
+                'Svg exceeds %d bytes' % self.max_bytes)
+        if self.max_pixels:
+            width, height = svg.width, svg.height
+            wmult, hmult = Svg.size_multipliers(size, width, height)
+            area = width * height * max(1, wmult * hmult)
+            if area > self.max_pixels:
+                raise RenderLimitExceeded(
+                    'Png would exceed %d pixels' % self.max_pixels)
+
+    def _check_sprite_limits(self, sprite, size):
+        """
+        Raises a :class:`.RenderLimitExceeded` if any icon of given
+        :class:`.Sprite` exceeds the configured limits in given *size*. The
+        limits apply to each icon on its own, not to the whole sprite.
+        """
+        wmult, hmult = Svg.size_multipliers(size, sprite.width, sprite.height)
+        for path, (height, width) in sorted(sprite.svg_dimensions.items()):
+            if path in sprite.svg_aliases:
+                continue
+            if self.max_bytes:
+                content = self._source(sprite.ctx, path)
+                if len(content.encode('UTF-8')) > self.max_bytes:
+                    raise RenderLimitExceeded(
+                        'Icon %s exceeds %d bytes' % (path, self.max_bytes))
+            if self.max_pixels:
+                area = width * height * max(1, wmult * hmult)
+                if area > self.max_pixels:
+                    raise RenderLimitExceeded(
+                        'Icon %s would exceed %d pixels' %
+                        (path, self.max_pixels))
+
+    def _reject(self, key, error, *, timeout=False):
+        """
+        Remembers that the png with given :meth:`render cache key
+        <._png_cache_key>` could not be rendered due to given *error*.
+
+        Exceeding the limits on bytes and pixels is a property of the image
+        and is stored in the :attr:`.render_cache`, too, which might be
+        shared with other hosts. A *timeout*, on the other hand, might just
+        as well be caused by the load of the current host, so it is only
+        remembered by this process for a short while.
+        """
+        self.metrics.incr('render.rejected')
+        if timeout:
+            expires = time.monotonic() + _timeout_rejection_ttl
+            self._remember_rejection(key, str(error), expires)
+            return
+        self._remember_rejection(key, str(error), None)
+        self._cache_set(self._rejected_key(key), str(error).encode('UTF-8'))
+
+    def _remember_rejection(self, key, reason, expires):
+        """
+        Stores the *reason* for a rejection in memory until the monotonic
+        time *expires*, or forever if it is `None`. Only the most recent
+        rejections are kept, as their keys contain the sizes requested by
+        clients.
+        """
+        with self._rejected_lock:
+            self._rejected[key] = (reason, expires)
+            self._rejected.move_to_end(key)
+            while len(self._rejected) > _max_rejections:
+                self._rejected.popitem(last=False)
+
+    def _rejection(self, key):
+        """
+        Returns the reason for a rejection :meth:`remembered
+        <._remember_rejection>` in memory, or `None`.
+        """
+        with self._rejected_lock:
+            try:
+                reason, expires = self._rejected[key]
+            except KeyError:
+                return None
+            if expires is not None and expires < time.monotonic():
+                del self._rejected[key]
+                return None
+            self._rejected.move_to_end(key)
+            return reason
+
+    def _rejected_key(self, key):
+        """
+        The :attr:`.render_cache` key for remembering the rejection of the png
+        with given :meth:`render cache key <._png_cache_key>`. Contains the
+        configured limits, so a rejection is forgotten if they are changed.
+        """
+        limits = '%s\0%d\0%d' % (key, self.max_bytes, self.max_pixels)
+        return 'rejected-' + hashlib.sha256(limits.encode('UTF-8')).hexdigest()
+
+    def _svg2png_timed(self, content, size):
+        """
+        Rasterizes svg *content* in a :class:`render worker <._RenderWorker>`,
+        which is killed if it exceeds the configured :confkey:`render.timeout`.
+        Other rasterizations are not affected by the timeout of one of them.
+        Workers are reused as long as they finish their rasterizations in
+        time.
+        """
+        with self._render_slots:
+            worker = None
+            with self._render_workers_lock:
+                while self._render_workers and worker is None:
+                    worker = self._render_workers.pop()
+                    if not worker.process.is_alive():
+                        worker.close()
+                        worker = None
+            if worker is None:
+                worker = _RenderWorker(_render_context())
+            try:
+                success, result = worker.render(
+                    content, size, self.render_timeout)
+            except BaseException:
+                worker.close()
+                raise
+            with self._render_workers_lock:
+                self._render_workers.append(worker)
+        if not success:
+            raise result
+        return result
+
+    def _png_cache_key(self, content, size):
+        """
+        The :attr:`.render_cache` key of the png rendered from given svg
+        *content* in given *size*, which must be normalized via
+        :func:`._pixel_size`.
+        """
+        sha = hashlib.sha256(content.encode('UTF-8'))
+        sha.update(('\0%s' % size).encode('UTF-8'))
+        if self.png_optimization:
+            sha.update(('\0%d\0%d' % self.png_optimization).encode('UTF-8'))
+        return 'png-' + sha.hexdigest()
+
+    def _cache_get(self, key):
+        if self.render_cache is None:
+            return None
+        value = self.render_cache.get(key)
+        if value is None:
+            self.metrics.incr('render_cache.miss')
+        else:
+            self.metrics.incr('render_cache.hit')
+        return value
+
+    def _cache_set(self, key, value):
+        if self.render_cache is not None:
+            self.render_cache.set(key, value)
+
+    @property
+    def executor(self):
+        """
+        The :class:`concurrent.futures.Executor` used by the asynchronous
+        rendering functions, as configured via :confkey:`executor`.
+        """
+        if self._executor is None:
+            import concurrent.futures
+            if self._executor_kind == 'process':
+                cls = concurrent.futures.ProcessPoolExecutor
+            else:
+                cls = concurrent.futures.ThreadPoolExecutor
+            self._executor = cls(self._executor_workers)
+        return self._executor
+
+    async def async_render_png(self, ctx, path, size=None, *, variant=None):
+        """
+        Coroutine version of :meth:`.render_png`, which performs the
+        rasterization in the configured :attr:`.executor`.
+        """
+        import asyncio
+        loop = asyncio.get_event_loop()
+        svg = await loop.run_in_executor(None, self.svg, ctx, path, variant)
+        return await self._async_rasterize(svg, size)
+
+    async def async_render_png_sprite(self, ctx, size=None, *, scale=None,
+                                      variant=None):
+        """
+        Coroutine version of :meth:`.render_png_sprite`, which performs the
+        rasterization in the configured :attr:`.executor`.
+        """
+        import asyncio
+        loop = asyncio.get_event_loop()
+        sprite = await loop.run_in_executor(
+            None, self.sprite, ctx, scale, variant)
+        return await self._async_rasterize(sprite, size)
+
+    async def _async_rasterize(self, svg, size):
+        """
+        Converts given :class:`.Svg` or :class:`.Sprite` to png in the
+        :attr:`.executor`. Uses the same :attr:`.render_cache` as
+        :meth:`._rasterize` and concurrent calls with the same svg content and
+        *size* will share a single rasterization. All access to the file
+        system and the render cache happens in the default executor of the
+        event loop.
+        """
+        import asyncio
+        loop = asyncio.get_event_loop()
+        size = await loop.run_in_executor(None, _pixel_size, svg, size)
+        content = await loop.run_in_executor(None, getattr, svg, 'content')
+        cachekey = self._png_cache_key(content, size)
+        png = await loop.run_in_executor(None, self._cache_get, cachekey)
+        if png is not None:
+            return png
+        await loop.run_in_executor(
+            None, self._check_limits, svg, content, size, cachekey)
+        key = (loop, cachekey)
+        try:
+            future = self._inflight[key]
+            self.metrics.incr('svg2png.inflight.hit')
+        except KeyError:
+            async def rasterize():
+                try:
+                    if self.render_timeout:
+                        # the worker process enforcing the timeout is blocking
+                        png = await loop.run_in_executor(
+                            None, self._svg2png_timed, content, size)
+                    else:
+                        png = await loop.run_in_executor(
+                            self.executor, _svg2png_string, content, size)
+                except RenderLimitExceeded as e:
+                    self._reject(cachekey, e, timeout=True)
+                    raise
+                if self.png_optimization:
+                    optimized = await loop.run_in_executor(
+                        self.executor, optimize_png, png,
+                        *self.png_optimization)
+                    png = self._optimized(svg, png, optimized)
+                await loop.run_in_executor(
+                    None, self._cache_set, cachekey, png)
+                return png
+            future = asyncio.ensure_future(rasterize())
+            self._inflight[key] = future
+            future.add_done_callback(lambda future: self._inflight.pop(key))
+        with self.metrics.timer('async_svg2png'):
+            return await asyncio.shield(future)
 
     convert_file = render_svg
 
 
+class RenderLimitExceeded(Exception):
+    """
+    Raised when rasterizing an svg file would exceed one of the configured
+    :confkey:`render limits <render.max_pixels>`.
+    """
+
+
 def svg2png(svg, size=None):
     """
     Converts an :class:`.Svg` or :class:`.Sprite` object to the png file
@@ -444,11 +1594,11 @@ def svg2png(svg, size=None):
     # that even this instance is avoidable by passing the correct parameters to
     # svg2png()
     from cairosvg import svg2png
-    from PIL import Image
-    import io
     png = svg2png(bytestring=svg.content.encode('ASCII'))
     if not size or size == 'auto':
         return png
+    from PIL import Image
+    import io
     wh_match = Svg.wh_regex.match(size)
     percent_match = Svg.percent_regex.match(size)
     if wh_match:
@@ -465,6 +1615,298 @@ def svg2png(svg, size=None):
     return output.getvalue()
 
 
+def _parse_variants(conf):
+    """
+    Extracts the :confkey:`variant.* <variant.*>` configuration values and
+    validates their names and colors.
+    """
+    variants = extract_conf(conf, 'variant.')
+    for name, color in variants.items():
+        if not _variant_name_regex.match(name):
+            raise ValueError('Invalid variant name: ' + name)
+        if not _color_regex.match(color):
+            raise ValueError('Invalid color of variant %s: %s' % (name, color))
+    return variants
+
+
+_variant_name_regex = re.compile(r'[a-zA-Z0-9_-]+$')
+_color_regex = re.compile(
+    r'(#[0-9a-fA-F]{3,8}|[a-zA-Z]+|(rgb|hsl)a?\([0-9.,%\s]+\))$')
+
+
+def _add_query(url, variant, hash_):
+    """
+    Appends the *variant* and the version *hash_* to given *url*.
+    """
+    query = []
+    if variant:
+        query.append(('variant', variant))
+    if hash_:
+        query.append(('_v', hash_))
+    if not query:
+        return url
+    return url + '?' + urllib.parse.urlencode(query)
+
+
+def recolor(content, color):
+    """
+    Changes all colors of the given svg *content* to *color*: every ``fill``
+    and ``stroke`` (both as attribute and inside ``style`` attributes) is
+    replaced, unless it is ``none``, ``transparent`` or references a
+    gradient or pattern. The root element additionally receives the *color*
+    as ``fill``, as that is the color of all shapes without an explicit one.
+    """
+    import xml.etree.ElementTree as ET
+    ET.register_namespace('', 'http://www.w3.org/2000/svg')
+    ET.register_namespace('xlink', 'http://www.w3.org/1999/xlink')
+    root = ET.fromstring(content)
+
+    def replace(value):
+        value = value.strip()
+        if value in ('none', 'transparent') or value.startswith('url('):
+            return value
+        return color
+
+    def replace_style(match):
+        return '%s:%s' % (match.group(1), replace(match.group(2)))
+
+    for element in root.iter():
+        for attr in ('fill', 'stroke'):
+            if attr in element.attrib:
+                element.attrib[attr] = replace(element.attrib[attr])
+        if 'style' in element.attrib:
+            element.attrib['style'] = _style_color_regex.sub(
+                replace_style, element.attrib['style'])
+    if 'fill' not in root.attrib:
+        root.attrib['fill'] = color
+    return ET.tostring(root, encoding='unicode')
+
+
+_style_color_regex = re.compile(r'\b(fill|stroke)\s*:\s*([^;]+)')
+
+
+def _parse_scales(conf):
+    """
+    Parses the :confkey:`sprite_scales` configuration value, which may also
+    be a whitespace-separated string.
+    """
+    scales = conf['sprite_scales']
+    if isinstance(scales, str):
+        scales = scales.split()
+    for scale in scales:
+        Svg.size_multipliers(scale, 1, 1)  # raises ValueError if invalid
+    return scales
+
+
+async def async_svg2png(svg, size=None, executor=None):
+    """
+    Coroutine version of :func:`.svg2png`, which performs the conversion in
+    given :class:`concurrent.futures.Executor`, or the event loop's default
+    executor if none was given.
+    """
+    import asyncio
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        executor, _svg2png_string, svg.content, size)
+
+
+def optimize_png(png, colors=256, compress_level=9):
+    """
+    Re-encodes given *png* `bytes` with given zlib *compress_level*. If
+    *colors* is not ``0``, the image is additionally converted to a paletted
+    image with at most that many colors, which retains transparency. Returns
+    the smallest of the re-encoded images and the original *png*.
+    """
+    from PIL import Image
+    import io
+
+    def encode(img):
+        output = io.BytesIO()
+        img.save(output, format='PNG', compress_level=compress_level)
+        return output.getvalue()
+    img = Image.open(io.BytesIO(png))
+    candidates = [png, encode(img)]
+    if colors:
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        # the fast octree is the only method supporting an alpha channel
+        img = img.quantize(colors, method=Image.FASTOCTREE)
+        # the palette always has the requested number of entries, drop the
+        # ones not used by any pixel
+        used = sorted(index for count, index in img.getcolors(colors))
+        if len(used) < colors:
+            img = img.remap_palette(used)
+        candidates.append(encode(img))
+    return min(candidates, key=len)
+
+
+# the number of rejected pngs remembered in memory
+_max_rejections = 1000
+
+# the number of seconds a rasterization exceeding the render.timeout is
+# remembered
+_timeout_rejection_ttl = 300
+
+
+def _pixel_size(svg, size):
+    """
+    Converts given *size* of given :class:`.Svg` or :class:`.Sprite` into the
+    form ``WxH`` in integer pixels, or `None` for the original size.
+    Equivalent spellings of a size, like ``5x5``, ``5.0x5`` or ``50%`` of a
+    10x10 image, thus share a single rendering.
+    """
+    wmult, hmult = Svg.size_multipliers(size, svg.width, svg.height)
+    if wmult == hmult == 1:
+        return None
+    return '%dx%d' % (round(svg.width * wmult), round(svg.height * hmult))
+
+
+def _purge_conf(conf):
+    """
+    Returns a copy of the *conf* suitable for detecting configuration changes
+    in :func:`score.init.init_cache_folder`. Instances passed as
+    :confkey:`cache` or :confkey:`executor` are replaced by the name of their
+    class, as their representation would differ on every start and thus purge
+    the cache folder each time.
+    """
+    conf = dict(conf.items())
+    for key in ('cache', 'executor'):
+        if not isinstance(conf[key], str):
+            cls = type(conf[key])
+            conf[key] = '%s.%s' % (cls.__module__, cls.__qualname__)
+    return conf
+
+
+def _parse_png_optimization(conf):
+    """
+    Returns the *colors* and *compress_level* arguments for
+    :func:`.optimize_png` as configured via :confkey:`png.colors` and
+    :confkey:`png.compress_level`, or `None` if :confkey:`png.optimize` is
+    disabled.
+    """
+    if not parse_bool(conf['png.optimize']):
+        return None
+    colors = int(conf['png.colors'])
+    compress_level = int(conf['png.compress_level'])
+    if not 0 <= colors <= 256:
+        raise ValueError('Invalid number of png colors: %d' % colors)
+    if not 0 <= compress_level <= 9:
+        raise ValueError('Invalid png compression level: %d' % compress_level)
+    return colors, compress_level
+
+
+def _svg2png_string(content, size):
+    """
+    Helper function for :func:`.svg2png`, which can be passed to a process
+    pool, as it only operates on strings.
+    """
+    return svg2png(Svg(None, None, string=content), size)
+
+
+def _render_context():
+    """
+    Returns the :mod:`multiprocessing` context for starting
+    :class:`render workers <._RenderWorker>`. Forking a web worker with
+    running threads might copy locks held by other threads into the child,
+    so workers are started via the forkserver, where available.
+    """
+    import multiprocessing
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class _RenderWorker:
+    """
+    A process started via given :mod:`multiprocessing` *context*, which
+    rasterizes svgs sent through a pipe, one at a time.
+    """
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_svg2png_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        # wait until the worker is ready, so its startup does not count
+        # against the timeout of its first rasterization
+        try:
+            self.connection.recv()
+        except EOFError:
+            self.process.join()
+            raise RuntimeError('Rendering process died with exit code %s' %
+                               self.process.exitcode)
+
+    def render(self, content, size, timeout):
+        """
+        Returns a tuple consisting of a success flag and the png rendered
+        from svg *content* in given *size* (or the exception raised while
+        rendering). Raises a :class:`.RenderLimitExceeded` if the worker
+        does not answer within *timeout* seconds, and a `RuntimeError` if it
+        died. The worker must be :meth:`closed <.close>` in both cases.
+        """
+        self.connection.send((content, size))
+        if not self.connection.poll(timeout):
+            raise RenderLimitExceeded(
+                'Rendering took longer than %s seconds' % timeout)
+        try:
+            return self.connection.recv()
+        except EOFError:
+            # the worker died without sending a result. this is not the
+            # svg's fault, so it must not be rejected.
+            self.process.join()
+            raise RuntimeError('Rendering process died with exit code %s' %
+                               self.process.exitcode)
+
+    def close(self):
+        """
+        Kills the process and closes the pipe.
+        """
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+def _svg2png_worker(connection):
+    """
+    Main loop of the :class:`render workers <._RenderWorker>`. Receives
+    tuples of svg content and size through given *connection* and sends
+    back tuples consisting of a success flag and the result of
+    :func:`._svg2png_string` (or the exception it raised).
+    """
+    connection.send(None)
+    while True:
+        try:
+            content, size = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = True, _svg2png_string(content, size)
+        except Exception as e:
+            result = False, e
+        connection.send(result)
+
+
+def svg2datauri(svg):
+    """
+    Converts an :class:`.Svg` object to a compact, URL-encoded ``data:`` URI,
+    which can be used inside a css ``url()`` statement. The return value
+    already contains the surrounding quotes.
+    """
+    content = svg.content
+    content = _datauri_strip_regex.sub('', content)
+    content = re.sub(r'>\s+<', '><', content)
+    content = re.sub(r'\s+', ' ', content).strip()
+    if "'" not in content:
+        content = content.replace('"', "'")
+    content = urllib.parse.quote(content, safe=" /:=';,.-_!~*()")
+    return '"data:image/svg+xml,%s"' % content
+
+
+_datauri_strip_regex = re.compile(
+    r'<\?xml.*?\?>|<!DOCTYPE[^>]*>|<!--.*?-->', re.DOTALL)
+
+
 class Svg:
     """
     X
@@ -534,6 +1976,7 @@ class Svg:
         Provides an :class:`xml.etree.ElementTree.Element` to the root node of
         this svg file.
         """
+        import xml.etree.ElementTree as ET
         if self.string:
             return ET.fromstring(self.string)
         return ET.parse(self.file).getroot()
@@ -542,6 +1985,22 @@ class Svg:
     def css_class(self):
         return Svg.path2css(self.path)
 
+    def content_hash(self):
+        """
+        Returns a hash of the canonical form of this image's content. Two
+        images differing only in formatting, attribute order or comments will
+        thus have the same hash.
+        """
+        import xml.etree.ElementTree as ET
+        content = self.content
+        try:
+            content = ET.canonicalize(content, strip_text=True)
+        except (AttributeError, ET.ParseError):
+            # python < 3.8 or malformed xml: fall back to normalizing
+            # whitespace
+            content = re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', content))
+        return hashlib.sha256(content.encode('UTF-8')).hexdigest()
+
     def wh_multipliers(self, size):
         """
         Given a *size* specification, this function will return multipliers
@@ -554,18 +2013,26 @@ class Svg:
         See the :ref:`narrative documentation <svg_png_conversion>` for a list
         of implemented *size* formats.
         """
+        return Svg.size_multipliers(size, self.width, self.height)
+
+    @staticmethod
+    def size_multipliers(size, width, height):
+        """
+        Same as :meth:`.wh_multipliers`, but for an image with given *width*
+        and *height*.
+        """
         if not size or size == 'auto':
             return 1, 1
         match = Svg.wh_regex.match(size)
         if match:
             w, h = match.group(1, 2)
-            widthmult = (float(w) / self.width)
-            heightmult = (float(h) / self.height)
+            widthmult = (float(w) / width)
+            heightmult = (float(h) / height)
             return widthmult, heightmult
         match = Svg.percent_regex.match(size)
         if match:
-            widthmult = 1 + float(match.group(1)) / 100
-            heightmult = 1 + float(match.group(1)) / 100
+            widthmult = float(match.group(1)) / 100
+            heightmult = float(match.group(1)) / 100
             return widthmult, heightmult
         raise ValueError('Unsupported size string: ' + size)
 
@@ -597,70 +2064,152 @@ class Sprite:
     X
     """
 
-    def __init__(self, ctx, conf):
+    def __init__(self, ctx, conf, scale=None, variant=None, *, rebuild=False,
+                 profile=None):
         self.ctx = ctx
         self.conf = conf
-        if self._load_cache():
-            return
+        self.scale = scale
+        self.variant = variant
+        if profile is None:
+            profile = conf.profile
+        self.profile = profile
+        if not rebuild:
+            with conf.metrics.timer('sprite.load'):
+                loaded = self._load_cache()
+            if loaded:
+                conf.metrics.incr('sprite.cache.hit')
+                return
+            conf.metrics.incr('sprite.cache.miss')
+        with conf.metrics.timer('sprite.build'):
+            self._build()
+        conf._write_profile(self.profile)
+
+    def _build(self):
+        ctx, conf = self.ctx, self.conf
         self.svg_dimensions = {}
         self.svg_offsets = {}
+        self.svg_aliases = {}
+        slots = {}
         offset = 0
         self.height = 0
+        profile = self.profile
         for path in self.conf.paths():
-            svg = Svg(ctx, path, file=os.path.join(conf.rootdir, path))
-            self.svg_dimensions[path] = (svg.height, svg.width)
+            icon = (path, self.scale, self.variant)
+            with profile.timer(icon, 'read'):
+                content = conf._source(ctx, path)
+            profile.record(icon, 'bytes', len(content.encode('UTF-8')))
+            svg = Svg(ctx, path, string=content)
+            with profile.timer(icon, 'hash'):
+                digest = svg.content_hash()
+            if digest in slots:
+                # identical to a previous icon: share its slot
+                original = slots[digest]
+                self.svg_aliases[path] = original
+                self.svg_dimensions[path] = self.svg_dimensions[original]
+                self.svg_offsets[path] = self.svg_offsets[original]
+                continue
+            slots[digest] = path
+            with profile.timer(icon, 'parse'):
+                wmult, hmult = svg.wh_multipliers(self.scale)
+            width, height = svg.width * wmult, svg.height * hmult
+            profile.record(icon, 'area', width * height)
+            self.svg_dimensions[path] = (height, width)
             self.svg_offsets[path] = offset
-            offset -= svg.width
-            self.height = max(self.height, svg.height)
+            offset -= width
+            self.height = max(self.height, height)
         self.width = -offset
+        self.css_rules = ''.join(
+            '.icon-%s{%s}\n' % (Svg.path2css(path), self.svg_css(path))
+            for path in self.conf.paths())
         self._write_cache()
 
     def _write_cache(self):
         if not self.conf.cachedir:
             return False
-        meta = os.path.join(self.conf.cachedir, '__sprite__.meta')
-        js = (self.width, self.height), self.svg_dimensions, self.svg_offsets
-        open(meta, 'w').write(json.dumps(js))
-        cachefile = os.path.join(self.conf.cachedir, '__sprite__.svg')
-        open(cachefile, 'w').write(self._generate_content())
+        import json
+        meta = self._cachefile('.meta')
+        # virtual icons have no file to compare modification times with
+        virtual_hashes = dict(
+            (path, self.conf.virtfiles.hash(self.ctx, path))
+            for path in self.svg_dimensions
+            if path in self.conf.virtfiles.paths())
+        js = ((self.width, self.height), self.svg_dimensions, self.svg_offsets,
+              self.svg_aliases, self.css_rules, virtual_hashes)
+        open(meta, 'w', encoding='UTF-8').write(json.dumps(js))
+        # the svg file may be streamed to clients while it is being replaced,
+        # so it must never be visible partially written
+        cachefile = self._cachefile('.svg')
+        tmpfile = '%s.%d.tmp' % (cachefile, os.getpid())
+        open(tmpfile, 'w', encoding='UTF-8').write(self._cached_content())
+        os.replace(tmpfile, cachefile)
         return True
 
     def _load_cache(self):
         if not self.conf.cachedir:
             return False
-        meta = os.path.join(self.conf.cachedir, '__sprite__.meta')
+        meta = self._cachefile('.meta')
         if not os.path.isfile(meta):
             return False
-        my_dimensions, svg_dimensions, svg_offsets = \
-            json.loads(open(meta, 'r').read())
+        import json
+        js = json.loads(open(meta, 'r').read())
+        if len(js) != 6:
+            # written by a previous version
+            return False
+        my_dimensions, svg_dimensions, svg_offsets, svg_aliases, css_rules, \
+            virtual_hashes = js
         if set(svg_dimensions.keys()) != set(self.conf.paths()):
             return False
         cachemtime = os.path.getmtime(meta)
         for path in svg_dimensions:
+            if path in self.conf.virtfiles.paths():
+                if self.conf.virtfiles.hash(self.ctx, path) != \
+                        virtual_hashes.get(path):
+                    return False
+                continue
             file = os.path.join(self.conf.rootdir, path)
             if os.path.getmtime(file) >= cachemtime:
                 return False
-        self.height, self.width = my_dimensions[0], my_dimensions[1]
+        self.width, self.height = my_dimensions[0], my_dimensions[1]
         self.svg_dimensions = svg_dimensions
         self.svg_offsets = svg_offsets
+        self.svg_aliases = svg_aliases
+        self.css_rules = css_rules
         return True
 
     def css(self, svgurl, pngurl):
-        css = '.icon{'
-        css += 'display:inline-block;'
-        css += 'background:url(%s)no-repeat;' % pngurl
-        css += 'background-image:url(%s),none}\n' % svgurl
-        for path in self.conf.paths():
-            css += '.icon-%s{%s}\n' % (Svg.path2css(path), self.svg_css(path))
-        return css
+        # the rules of the individual icons are generated once, when the
+        # sprite is built, and stored in its meta file
+        return ''.join((
+            '.icon{',
+            'display:inline-block;',
+            'background:url(%s)no-repeat;' % pngurl,
+            'background-image:url(%s),none}\n' % svgurl,
+            self.css_rules,
+        ))
+
+    def manifest(self):
+        """
+        Returns the layout of this sprite as a `dict`, as described in
+        :meth:`.ConfiguredSvgModule.render_sprite_manifest`.
+        """
+        icons = {}
+        for path, (height, width) in self.svg_dimensions.items():
+            icons[Svg.path2css(path)] = {
+                'path': path,
+                # the offsets are the (negative) css background positions
+                'x': abs(self.svg_offsets[path]),
+                'width': width,
+                'height': height,
+            }
+        return {
+            'width': self.width,
+            'height': self.height,
+            'icons': icons,
+        }
 
     def svg_css(self, path, size=None):
-        wmult, hmult = 1, 1
-        if size:
-            svg = Svg(self.ctx, path,
-                      file=os.path.join(self.conf.rootdir, path))
-            wmult, hmult = svg.wh_multipliers(size)
         dim = self.svg_dimensions[path]
+        wmult, hmult = Svg.size_multipliers(size, dim[1], dim[0])
         w, h = dim[1] * wmult, dim[0] * hmult
         offset = self.svg_offsets[path] * wmult
         css = 'width:%dpx;height:%dpx;' % (w, h)
@@ -670,27 +2219,100 @@ class Sprite:
                                                   self.height * hmult)
         return css
 
+    def _cachefile(self, extension):
+        """
+        Returns the path to this sprite's cache file with given *extension*.
+        """
+        name = '__sprite__'
+        if self.scale:
+            name += '@' + self.scale
+        name += self.conf._variant_suffix(self.variant)
+        return os.path.join(self.conf.cachedir, name + extension)
+
+    @property
+    def file(self):
+        """
+        The path to the cache file containing this sprite's svg content, or
+        `None` if there is no such file.
+        """
+        if not self.conf.cachedir:
+            return None
+        cachefile = self._cachefile('.svg')
+        if os.path.isfile(cachefile):
+            return cachefile
+        return None
+
     @property
     def content(self):
         if self.conf.cachedir:
-            cachefile = os.path.join(self.conf.cachedir, '__sprite__.svg')
+            cachefile = self._cachefile('.svg')
             try:
-                return open(cachefile, 'r').read()
+                return open(cachefile, 'r', encoding='UTF-8').read()
             except FileNotFoundError:
                 pass
-        return self._generate_content()
+        return self._cached_content()
+
+    def _cached_content(self):
+        """
+        Provides the sprite's content from the configuration's
+        :attr:`render cache <.ConfiguredSvgModule.render_cache>`, generating
+        and storing it on a cache miss.
+        """
+        if self.conf.render_cache is None:
+            return self._generate_content()
+        paths = self.conf.paths()
+        key = self.conf._sources_hash(self.ctx, paths)
+        if self.scale or self.variant:
+            color = self.conf.variants.get(self.variant)
+            key = hashlib.sha256(('%s\0%s\0%s' % (
+                key, self.scale, color)).encode('UTF-8')).hexdigest()
+        key = 'sprite-' + key
+        content = self.conf._cache_get(key)
+        if content is not None:
+            return content.decode('UTF-8')
+        content = self._generate_content()
+        self.conf._cache_set(key, content.encode('UTF-8'))
+        return content
 
     def _generate_content(self):
+        import io
+        import xml.etree.ElementTree as ET
         result = ET.Element('svg', {
             'version': '1.1',
         })
         result.set('width', str(self.width))
         result.set('height', str(self.height))
+        views = []
         for path in self.conf.paths():
-            svg = self.conf.tpl.renderer.render_file(self.ctx, path)
-            svg = Svg(self.ctx, path, string=svg)
-            root = svg.xml_root()
+            if path in self.svg_aliases:
+                # aliases are referenced via <view> elements with their
+                # own id, instead of repeating the image
+                height, width = self.svg_dimensions[path]
+                views.append(ET.Element('view', {
+                    'id': Svg.path2css(path),
+                    'viewBox': '%s 0 %s %s' % (
+                        -self.svg_offsets[path], width, height),
+                }))
+                continue
+            icon = (path, self.scale, self.variant)
+            with self.profile.timer(icon, 'render'):
+                svg = self.conf.svg(self.ctx, path, self.variant)
+                root = svg.xml_root()
+            if self.profile.enabled:
+                self.profile.record(
+                    icon, 'elements', sum(1 for _ in root.iter()))
             root.attrib['id'] = svg.css_class
+            if self.scale:
+                # render in target size by adjusting the dimensions while
+                # keeping the original coordinate system in the viewBox
+                height, width = self.svg_dimensions[path]
+                if 'viewBox' not in root.attrib:
+                    root.attrib['viewBox'] = '0 0 %s %s' % (
+                        svg.width, svg.height)
+                if Svg.wh_regex.match(self.scale):
+                    root.attrib['preserveAspectRatio'] = 'none'
+                root.attrib['width'] = str(width)
+                root.attrib['height'] = str(height)
             if self.svg_offsets[path]:
                 translate = 'translate(%d)' % -self.svg_offsets[path]
                 try:
@@ -699,6 +2321,7 @@ class Sprite:
                 except KeyError:
                     root.attrib['transform'] = translate
             result.append(root)
+        result.extend(views)
         result = ET.ElementTree(result)
         ET.register_namespace('', 'http://www.w3.org/2000/svg')
         with io.StringIO() as buf:
@@ -0,0 +1,287 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import threading
+import time
+
+
+class Metrics:
+    """
+    Collects timings and counters of this module's hot paths. Every
+    :class:`.ConfiguredSvgModule` has an instance of this class as its
+    :attr:`metrics <.ConfiguredSvgModule.metrics>` attribute, which is
+    disabled by default (see the :confkey:`metrics` configuration key).
+
+    Collected values are aggregated in-process and can be retrieved via
+    :meth:`.snapshot`. They are additionally passed to all registered
+    :meth:`callbacks <.add_callback>`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.callbacks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add_callback(self, callback):
+        """
+        Registers a *callback*, that will be invoked with three arguments for
+        every collected value: the kind of value (either ``'timing'`` or
+        ``'counter'``), its name and the value itself. Timings are passed in
+        seconds.
+        """
+        self.callbacks.append(callback)
+
+    def add_statsd(self, client, prefix='score.svg.'):
+        """
+        Forwards all collected values to a statsd *client*, which must provide
+        the methods ``timing(name, milliseconds)`` and ``incr(name, count)``.
+        """
+        def callback(kind, name, value):
+            if kind == 'timing':
+                client.timing(prefix + name, value * 1000)
+            else:
+                client.incr(prefix + name, value)
+        self.add_callback(callback)
+
+    def incr(self, name, count=1):
+        """
+        Increments the counter with given *name*.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+        for callback in self.callbacks:
+            callback('counter', name, count)
+
+    def timing(self, name, seconds):
+        """
+        Records a duration for the timer with given *name*.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                timer = self._timers[name]
+            except KeyError:
+                timer = self._timers[name] = [0, 0., seconds, seconds]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = min(timer[2], seconds)
+            timer[3] = max(timer[3], seconds)
+        for callback in self.callbacks:
+            callback('timing', name, seconds)
+
+    def timer(self, name):
+        """
+        Returns a context manager measuring the duration of its block::
+
+            with metrics.timer('render_png'):
+                ...
+        """
+        if not self.enabled:
+            return _null_timer
+        return _Timer(self, name)
+
+    def snapshot(self):
+        """
+        Returns all values collected since the last :meth:`.reset` as a `dict`
+        with the keys ``counters`` and ``timers``. The latter contains a
+        `dict` for each timer with the keys ``count``, ``total``, ``min``,
+        ``max`` and ``mean``.
+        """
+        with self._lock:
+            timers = {}
+            for name, (count, total, min_, max_) in self._timers.items():
+                timers[name] = {
+                    'count': count,
+                    'total': total,
+                    'min': min_,
+                    'max': max_,
+                    'mean': total / count,
+                }
+            return {
+                'counters': dict(self._counters),
+                'timers': timers,
+            }
+
+    def hit_ratio(self, name):
+        """
+        Returns the ratio of the counters ``<name>.hit`` and ``<name>.miss``,
+        or `None` if neither was incremented yet.
+        """
+        with self._lock:
+            hits = self._counters.get(name + '.hit', 0)
+            misses = self._counters.get(name + '.miss', 0)
+        if not hits + misses:
+            return None
+        return hits / (hits + misses)
+
+    def reset(self):
+        """
+        Discards all collected values.
+        """
+        with self._lock:
+            self._counters = {}
+            self._timers = {}
+
+
+class _Timer:
+
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.timing(self.name, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class SpriteProfile:
+    """
+    Records the cost of each icon during :term:`sprite` generation, allowing
+    to find icons slowing down the process. Every :class:`.ConfiguredSvgModule`
+    has an instance of this class as its :attr:`profile
+    <.ConfiguredSvgModule.profile>` attribute, which is disabled by default
+    (see the :confkey:`profile` configuration key).
+
+    The values are recorded per *icon*, which is a tuple consisting of the
+    :term:`path <asset path>` of the icon and the *scale* and *variant* of the
+    sprite, as the same icon has different costs in different sprites. The
+    following values are recorded, durations are in seconds:
+
+    - ``read``: time for reading (or rendering, in case of templates) the
+      source of the icon,
+    - ``hash``: time for calculating the hash of its content,
+    - ``parse``: time for determining its dimensions,
+    - ``render``: time for adding it to the sprite's content,
+    - ``rasterize``: time for rasterizing the icon on its own, which is only
+      measured during :meth:`.ConfiguredSvgModule.render_png_sprite`,
+    - ``bytes``: size of its source,
+    - ``elements``: number of xml elements,
+    - ``area``: area in pixels within the sprite.
+
+    An icon that could not be rasterized also has an ``error``.
+    """
+
+    timings = ('read', 'hash', 'parse', 'render', 'rasterize')
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, icon, name, value):
+        """
+        Stores the *value* with given *name* for given *icon*, replacing any
+        previous value.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                entry = self._entries[icon]
+            except KeyError:
+                path, scale, variant = icon
+                entry = self._entries[icon] = {
+                    'path': path, 'scale': scale, 'variant': variant}
+            entry[name] = value
+
+    def timer(self, icon, name):
+        """
+        Returns a context manager recording the duration of its block as the
+        value with given *name* for given *icon*.
+        """
+        if not self.enabled:
+            return _null_timer
+        return _ProfileTimer(self, icon, name)
+
+    def entries(self, sort='total'):
+        """
+        Returns a list of all recorded entries as `dicts`, sorted by the value
+        with given name in descending order. Each entry contains the
+        recorded values, the ``path``, ``scale`` and ``variant`` of its icon
+        and the ``total`` of all durations.
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry['total'] = sum(entry.get(name, 0) for name in self.timings)
+        entries.sort(key=lambda entry: entry.get(sort, 0), reverse=True)
+        return entries
+
+    def write(self, file, sort='total'):
+        """
+        Writes the sorted :meth:`.entries` as JSON into given *file*.
+        """
+        import json
+        with open(file, 'w') as fp:
+            json.dump(self.entries(sort), fp, indent=2, sort_keys=True)
+
+    def reset(self):
+        """
+        Discards all recorded entries.
+        """
+        with self._lock:
+            self._entries = {}
+
+
+class _ProfileTimer:
+
+    __slots__ = ('profile', 'icon', 'name', 'started')
+
+    def __init__(self, profile, icon, name):
+        self.profile = profile
+        self.icon = icon
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profile.record(
+            self.icon, self.name, time.perf_counter() - self.started)
@@ -0,0 +1,173 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+"""
+This package contains the backends for storing rendered blobs (pngs and
+sprites) of :mod:`score.svg`. All blobs are stored under a key derived from
+the hash of the content they were rendered from, so a backend can be shared
+between all nodes of a cluster: a blob rendered by one node can be used by
+all others.
+
+The backend is configured via the :confkey:`cache` configuration key of
+:func:`score.svg.init`.
+"""
+
+import os
+import threading
+
+
+class RenderCache:
+    """
+    Base class for render cache backends. Keys are strings consisting of
+    ASCII letters, digits and hyphens, values are `bytes`.
+    """
+
+    def get(self, key):
+        """
+        Returns the blob stored under given *key*, or `None` if there is no
+        such blob.
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        """
+        Stores the *value* under given *key*.
+        """
+        raise NotImplementedError()
+
+    def file(self, key):
+        """
+        Returns the path to a local file containing the blob stored under given
+        *key*, or `None` if there is no such file. Backends not storing their
+        blobs in the local file system will always return `None`.
+        """
+        return None
+
+
+class MemoryCache(RenderCache):
+    """
+    Keeps all blobs in memory of the current process. Mostly useful for
+    testing.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+
+    def get(self, key):
+        return self.blobs.get(key)
+
+    def set(self, key, value):
+        self.blobs[key] = value
+
+
+class DirectoryCache(RenderCache):
+    """
+    Stores blobs as files in given *folder*. Files are written to a temporary
+    file first and then renamed, so readers never see partially written
+    blobs.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def file(self, key):
+        file = self._file(key)
+        if os.path.isfile(file):
+            return file
+        return None
+
+    def get(self, key):
+        try:
+            with open(self._file(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmpfile = self._tmpfile(file)
+        try:
+            with open(tmpfile, 'wb') as fp:
+                self._write(fp, value)
+            os.replace(tmpfile, file)
+        except OSError:
+            try:
+                os.unlink(tmpfile)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _file(self, key):
+        return os.path.join(self.folder, key[-2:], key)
+
+    def _tmpfile(self, file):
+        return '%s.%d.%d.tmp' % (file, os.getpid(), threading.get_ident())
+
+    def _write(self, fp, value):
+        fp.write(value)
+
+
+class SharedDirectoryCache(DirectoryCache):
+    """
+    A :class:`.DirectoryCache` for a *folder* shared between several hosts,
+    for example via NFS. Temporary files are named uniquely across hosts and
+    flushed to the server before they are renamed, which is an atomic
+    operation on NFS, too.
+    """
+
+    def _tmpfile(self, file):
+        import socket
+        import uuid
+        return '%s.%s.%s.tmp' % (file, socket.gethostname(), uuid.uuid4().hex)
+
+    def _write(self, fp, value):
+        fp.write(value)
+        fp.flush()
+        os.fsync(fp.fileno())
+
+
+class ClientCache(RenderCache):
+    """
+    Stores blobs in a key-value store like Redis or memcached. The *client*
+    must provide the methods ``get(key)`` and ``set(key, value)``, as the
+    client objects of the redis_ and pymemcache_ packages do, for example.
+    All keys are prefixed with given *prefix*.
+
+    .. _redis: https://pypi.python.org/pypi/redis
+    .. _pymemcache: https://pypi.python.org/pypi/pymemcache
+    """
+
+    def __init__(self, client, prefix='score.svg:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value)
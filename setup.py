@@ -28,11 +28,11 @@ setup(
             'Public License v3 or later (LGPLv3+)',
         'Operating System :: OS Independent',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Topic :: Software Development :: Libraries :: Application Frameworks',
     ],
     include_package_data=True,
+    python_requires='>=3.5',
     install_requires=[
         'score.webassets >= 0.2.1',
         'score.css >= 0.2.1',
@@ -0,0 +1,125 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import os
+import sys
+import types
+
+import pytest
+import webob
+
+# the stand-ins for the modules score.svg depends on are shared with the
+# benchmarks
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'benchmarks'))
+
+import score.svg  # noqa: E402
+from score.svg import _init  # noqa: E402
+import standins  # noqa: E402
+
+
+@pytest.fixture
+def icons(tmpdir):
+    """
+    The folder containing three generated icons.
+    """
+    folder = str(tmpdir.join('icons'))
+    standins.generate_icons(folder, 3)
+    return folder
+
+
+@pytest.fixture
+def init_svg(tmpdir, icons):
+    """
+    Returns a function initializing :mod:`score.svg` with the generated
+    :func:`icons` and the given configuration.
+    """
+    def init(conf=None, *, versioned=True):
+        confdict = {
+            'rootdir': icons,
+            'cachedir': str(tmpdir.join('cache')),
+        }
+        confdict.update(conf or {})
+        webassets = standins.Webassets(str(tmpdir.join('webassets')),
+                                       versioned)
+        return score.svg.init(confdict, standins.Http(), webassets,
+                              standins.Tpl(), standins.Css())
+    return init
+
+
+@pytest.fixture
+def conf():
+    """
+    The configuration of the :func:`svgconf`, which test modules override.
+    """
+    return {}
+
+
+@pytest.fixture
+def svgconf(init_svg, conf):
+    return init_svg(conf)
+
+
+@pytest.fixture
+def ctx(svgconf):
+    return standins.Context(svgconf.http)
+
+
+@pytest.fixture
+def rasterizations(monkeypatch):
+    """
+    Replaces the rasterization with a fake one returning ``b'png'`` and
+    returns the list of rasterized sizes.
+    """
+    calls = []
+
+    def svg2png(svg, size=None):
+        calls.append(size)
+        return b'png'
+
+    def svg2png_string(content, size=None):
+        calls.append(size)
+        return b'png'
+    monkeypatch.setattr(_init, 'svg2png', svg2png)
+    monkeypatch.setattr(_init, '_svg2png_string', svg2png_string)
+    return calls
+
+
+@pytest.fixture
+def get():
+    """
+    Returns a function passing a GET request for given *url* to the
+    callback of given *route* of a configured module.
+    """
+    def get(svgconf, url, route, *args, **headers):
+        request = webob.Request.blank(url, headers=headers)
+        ctx = standins.Context(svgconf.http)
+        ctx.http = types.SimpleNamespace(
+            request=request, response=webob.Response())
+        svgconf.http.routes[route].callback(ctx, *args)
+        return request.get_response(ctx.http.response)
+    return get
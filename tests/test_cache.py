@@ -0,0 +1,179 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import asyncio
+import os
+
+import pytest
+
+from score.svg.cache import (
+    MemoryCache, DirectoryCache, SharedDirectoryCache, ClientCache)
+
+
+def _files(folder):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), folder)
+        for root, dirs, files in os.walk(folder)
+        for name in files)
+
+
+@pytest.fixture
+def conf():
+    return {'cache': 'memory'}
+
+
+@pytest.fixture(params=[DirectoryCache, SharedDirectoryCache])
+def directory_cache(request, tmpdir):
+    return request.param(str(tmpdir.join('render')))
+
+
+def test_directory_cache_roundtrip(directory_cache):
+    assert directory_cache.get('abc123') is None
+    assert directory_cache.file('abc123') is None
+    directory_cache.set('abc123', b'blob')
+    assert directory_cache.get('abc123') == b'blob'
+    with open(directory_cache.file('abc123'), 'rb') as fp:
+        assert fp.read() == b'blob'
+    directory_cache.set('abc123', b'other')
+    assert directory_cache.get('abc123') == b'other'
+    assert _files(directory_cache.folder) == [os.path.join('23', 'abc123')]
+
+
+def test_directory_cache_replaces_atomically(directory_cache, monkeypatch):
+    replaced = []
+
+    def replace(src, dst):
+        with open(src, 'rb') as fp:
+            assert fp.read() == b'blob'
+        assert not os.path.exists(dst)
+        replaced.append(dst)
+        os_replace(src, dst)
+    os_replace = os.replace
+    monkeypatch.setattr(os, 'replace', replace)
+    directory_cache.set('abc123', b'blob')
+    assert replaced == [directory_cache.file('abc123')]
+
+
+def test_directory_cache_removes_tmpfile_on_error(directory_cache,
+                                                  monkeypatch):
+    def replace(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(os, 'replace', replace)
+    with pytest.raises(OSError):
+        directory_cache.set('abc123', b'blob')
+    assert _files(directory_cache.folder) == []
+    assert directory_cache.get('abc123') is None
+
+
+def test_shared_directory_cache_syncs(tmpdir, monkeypatch):
+    cache = SharedDirectoryCache(str(tmpdir))
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(fsync(fd)))
+    cache.set('abc123', b'blob')
+    assert len(synced) == 1
+    file = cache._file('abc123')
+    assert cache._tmpfile(file) != cache._tmpfile(file)
+
+
+def test_client_cache():
+    class Client:
+        def __init__(self):
+            self.values = {}
+
+        def get(self, key):
+            return self.values.get(key)
+
+        def set(self, key, value):
+            self.values[key] = value
+    client = Client()
+    cache = ClientCache(client, prefix='test:')
+    assert cache.get('abc123') is None
+    cache.set('abc123', b'blob')
+    assert client.values == {'test:abc123': b'blob'}
+    assert cache.get('abc123') == b'blob'
+    assert cache.file('abc123') is None
+
+
+def test_memory_cache_module(svgconf, ctx, rasterizations):
+    assert isinstance(svgconf.render_cache, MemoryCache)
+    path = svgconf.paths()[0]
+    assert svgconf.render_png(ctx, path, '16x16') == b'png'
+    assert svgconf.render_png(ctx, path, '16x16') == b'png'
+    assert rasterizations == ['16x16']
+    assert list(svgconf.render_cache.blobs.values()) == [b'png']
+
+
+def test_async_render_uses_cache(svgconf, ctx, rasterizations):
+    path = svgconf.paths()[0]
+
+    async def render():
+        return await asyncio.gather(
+            svgconf.async_render_png(ctx, path, '16x16'),
+            svgconf.async_render_png(ctx, path, '16x16'))
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(render()) == [b'png', b'png']
+        assert loop.run_until_complete(
+            svgconf.async_render_png(ctx, path, '16x16')) == b'png'
+    finally:
+        loop.close()
+    assert rasterizations == ['16x16']
+    assert list(svgconf.render_cache.blobs.values()) == [b'png']
+
+
+def test_cache_instance_keeps_cachedir(tmpdir, init_svg):
+    cachedir = tmpdir.join('cache')
+    init_svg({'cache': MemoryCache()})
+    cachedir.join('keep').write('')
+    init_svg({'cache': MemoryCache()})
+    assert cachedir.join('keep').check()
+    init_svg({'cache': 'none'})
+    assert not cachedir.join('keep').check()
+
+
+def test_size_spellings_share_blob(svgconf, ctx, get, rasterizations):
+    route = 'score.svg:single/png/resized'
+    ctx.url(route, 'set00/icon00000.svg', '5x5')
+    for size in ('5x5', '5.0x5', '5.00x5'):
+        response = get(svgconf, '/', route, 'set00/icon00000', size)
+        assert response.body == b'png'
+    assert rasterizations == ['5x5']
+    assert len(svgconf.render_cache.blobs) == 1
+
+
+def test_unknown_size_is_not_persisted(svgconf, get, rasterizations):
+    route = 'score.svg:single/png/resized'
+    for size in ('6x6', '7x7'):
+        response = get(svgconf, '/', route, 'set00/icon00000', size)
+        assert response.body == b'png'
+    assert rasterizations == ['6x6', '7x7']
+    assert not svgconf.render_cache.blobs
+
+
+def test_shared_cache_requires_folder(init_svg):
+    with pytest.raises(ValueError, match='cache.folder'):
+        init_svg({'cache': 'shared'})
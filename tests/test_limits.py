@@ -0,0 +1,88 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import os
+
+import pytest
+
+from score.svg import RenderLimitExceeded
+import standins
+
+
+HUGE_ICON = '''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" version="1.1"
+     width="5000px" height="5000px"/>
+'''
+
+
+@pytest.fixture
+def huge_icon(icons):
+    with open(os.path.join(icons, 'huge.svg'), 'w') as fp:
+        fp.write(HUGE_ICON)
+    return 'huge.svg'
+
+
+@pytest.fixture
+def conf():
+    return {'render.max_pixels': 1000000}
+
+
+def test_oversized_icon_in_url_generation(svgconf, ctx, huge_icon,
+                                          rasterizations):
+    css = svgconf.css.virtuals['icons'](ctx)
+    for path in svgconf.paths():
+        assert '/svg/%s.png' % path[:-4] in css
+    assert '/svg/huge.png)' in css
+    assert '/svg/set00/icon00000.png?_v=' in css
+    assert 'huge.png' in svgconf.icon_css(ctx, huge_icon)
+    assert len(rasterizations) == len(svgconf.paths()) - 1
+
+
+def test_sprite_limits_apply_per_icon(init_svg, icons, huge_icon,
+                                      rasterizations):
+    max_bytes = max(os.path.getsize(os.path.join(root, file))
+                    for root, dirs, files in os.walk(icons)
+                    for file in files)
+    svgconf = init_svg({'combine': True, 'render.max_bytes': max_bytes})
+    ctx = standins.Context(svgconf.http)
+    assert len(svgconf.sprite(ctx).content) > max_bytes
+    assert svgconf.render_png_sprite(ctx) == b'png'
+    svgconf = init_svg({'combine': True, 'render.max_pixels': 1000000})
+    ctx = standins.Context(svgconf.http)
+    css = svgconf.css.virtuals['icons'](ctx)
+    assert '/combined.png)' in css
+    with pytest.raises(RenderLimitExceeded, match='huge.svg'):
+        svgconf.render_png_sprite(ctx)
+
+
+def test_oversized_rejection_is_stored(svgconf, ctx, huge_icon,
+                                       rasterizations):
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, huge_icon)
+    svgconf._rejected.clear()
+    with pytest.raises(RenderLimitExceeded, match='pixels'):
+        svgconf._check_limits(None, '', None, svgconf._png_cache_key(
+            svgconf.svg(ctx, huge_icon).content, None))
@@ -0,0 +1,196 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from score.svg import _init
+from score.svg._init import RenderLimitExceeded, optimize_png
+import standins
+
+
+@pytest.fixture
+def conf():
+    return {
+        'render.timeout': 0.5,
+        'executor.workers': 2,
+    }
+
+
+@pytest.fixture
+def slow_paths(svgconf, ctx, monkeypatch):
+    """
+    Makes the worker processes hang when rasterizing the first path and
+    die when rasterizing the second one.
+    """
+    paths = svgconf.paths()
+    slow = svgconf.svg(ctx, paths[0]).content
+    dying = svgconf.svg(ctx, paths[1]).content
+
+    def svg2png_string(content, size=None):
+        if content == slow:
+            time.sleep(10)
+        elif content == dying:
+            os._exit(1)
+        return b'png'
+    monkeypatch.setattr(_init, '_svg2png_string', svg2png_string)
+    # the replacement is only visible in forked workers
+    monkeypatch.setattr(_init, '_render_context',
+                        lambda: multiprocessing.get_context('fork'))
+    return paths
+
+
+def test_timeout_affects_single_rendering(svgconf, ctx, slow_paths):
+    results = {}
+
+    def render(path):
+        try:
+            results[path] = svgconf.render_png(ctx, path)
+        except RenderLimitExceeded as e:
+            results[path] = e
+    threads = [threading.Thread(target=render, args=(path,))
+               for path in (slow_paths[0], slow_paths[2])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert isinstance(results[slow_paths[0]], RenderLimitExceeded)
+    assert results[slow_paths[2]] == b'png'
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, slow_paths[0])
+    assert svgconf.render_png(ctx, slow_paths[2]) == b'png'
+
+
+def test_dead_worker_is_not_rejected(svgconf, ctx, slow_paths):
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            svgconf.render_png(ctx, slow_paths[1])
+    assert not svgconf._rejected
+
+
+def test_workers_are_reused(svgconf, ctx, slow_paths):
+    for _ in range(2):
+        assert svgconf.render_png(ctx, slow_paths[2], '10x10') == b'png'
+        assert len(svgconf._render_workers) == 1
+    worker = svgconf._render_workers[0]
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, slow_paths[0])
+    assert not svgconf._render_workers
+    assert not worker.process.is_alive()
+    assert svgconf.render_png(ctx, slow_paths[2], '20x20') == b'png'
+    assert len(svgconf._render_workers) == 1
+
+
+@pytest.mark.skipif(
+    'forkserver' not in multiprocessing.get_all_start_methods(),
+    reason='forkserver not available')
+def test_forkserver_worker(svgconf, ctx):
+    assert _init._render_context().get_start_method() == 'forkserver'
+    content = svgconf.svg(ctx, svgconf.paths()[0]).content
+    try:
+        png = svgconf._svg2png_timed(content, None)
+    except OSError:
+        # cairo is not installed
+        pass
+    else:
+        assert png.startswith(b'\x89PNG')
+    assert len(svgconf._render_workers) == 1
+
+
+def _png(mode, colors):
+    from PIL import Image, ImageDraw
+    img = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for i in range(colors):
+        draw.rectangle([i, i, i + 20, i + 20], fill=(i * 40, 0, 0, 255))
+    output = io.BytesIO()
+    img.convert(mode).save(output, format='PNG', compress_level=0)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('mode', ['RGBA', 'RGB', 'L'])
+def test_optimized_png_is_smaller(mode):
+    from PIL import Image
+    png = _png(mode, 3)
+    optimized = optimize_png(png)
+    assert len(optimized) < len(png)
+    img = Image.open(io.BytesIO(optimized))
+    if img.mode == 'P':
+        assert len(img.getpalette()) <= 3 * 4
+    assert len(optimize_png(optimized)) <= len(optimized)
+
+
+def test_profile_sprite(init_svg, conf, slow_paths):
+    svgconf = init_svg(dict(conf, **{
+        'sprite_scales': '200%',
+        'variant.danger': '#c00',
+    }))
+    ctx = standins.Context(svgconf.http)
+    entries = svgconf.profile_sprite(ctx, scale='200%', variant='danger')
+    assert not svgconf.profile.enabled
+    assert not svgconf.profile.entries()
+    assert sorted(entry['path'] for entry in entries) == svgconf.paths()
+    for entry in entries:
+        assert entry['scale'] == '200%'
+        assert entry['variant'] == 'danger'
+        assert 'render' in entry
+    entries = svgconf.profile_sprite(ctx, rasterize=True)
+    entries = {entry['path']: entry for entry in entries}
+    assert entries[slow_paths[0]]['error'] == \
+        'Rendering took longer than 0.5 seconds'
+    assert 'Rendering process died' in entries[slow_paths[1]]['error']
+    assert 'error' not in entries[slow_paths[2]]
+    assert entries[slow_paths[2]]['scale'] is None
+
+
+def test_timeout_rejection_expires(svgconf, ctx, slow_paths, monkeypatch):
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, slow_paths[0])
+    assert not [file
+                for root, dirs, files in os.walk(svgconf.render_cache.folder)
+                for file in files if file.startswith('rejected-')]
+    start = time.monotonic()
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, slow_paths[0])
+    assert time.monotonic() - start < 0.5
+    monkeypatch.setattr(_init, '_timeout_rejection_ttl', -1)
+    svgconf._rejected.clear()
+    with pytest.raises(RenderLimitExceeded):
+        svgconf.render_png(ctx, slow_paths[0])
+    assert svgconf._rejection(svgconf._png_cache_key(
+        svgconf.svg(ctx, slow_paths[0]).content, None)) is None
+
+
+def test_rejections_are_bounded(svgconf, monkeypatch):
+    monkeypatch.setattr(_init, '_max_rejections', 2)
+    for key in ('a', 'b', 'c'):
+        svgconf._reject(key, RenderLimitExceeded(key))
+    assert list(svgconf._rejected) == ['b', 'c']
@@ -0,0 +1,84 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import pytest
+
+
+@pytest.fixture
+def conf():
+    return {'combine': True}
+
+
+def test_versioned_response_is_streamed(svgconf, ctx, get):
+    url = ctx.url('score.svg:single/svg', 'set00/icon00000.svg')
+    response = get(svgconf, url, 'score.svg:single/svg', 'set00/icon00000')
+    assert response.status_int == 200
+    assert response.etag == url.split('_v=')[1]
+    assert 'immutable' in response.headers['Cache-Control']
+    content = response.body
+    assert b'<svg' in content
+    response = get(svgconf, url, 'score.svg:single/svg', 'set00/icon00000',
+                    Range='bytes=0-3')
+    assert response.status_int == 206
+    assert response.body == content[:4]
+
+
+def test_if_modified_since(svgconf, get):
+    response = get(svgconf, '/', 'score.svg:single/svg', 'set00/icon00000')
+    assert response.last_modified
+    response = get(svgconf, '/', 'score.svg:single/svg', 'set00/icon00000',
+                    **{'If-Modified-Since': response.headers['Last-Modified'],
+                       'If-None-Match': '"%s"' % ('0' * 64)})
+    assert response.status_int == 200
+    response = get(svgconf, '/', 'score.svg:single/svg', 'set00/icon00000',
+                    **{'If-Modified-Since': response.headers['Last-Modified']})
+    assert response.status_int == 304
+
+
+@pytest.mark.parametrize('route', [
+    'score.svg:combined/svg',
+    'score.svg:combined/png',
+    'score.svg:combined/json',
+])
+@pytest.mark.parametrize('etag', ['W/"abc"', '*', '"abc", "def"'])
+def test_arbitrary_if_none_match(svgconf, ctx, get, rasterizations, route,
+                                 etag):
+    url = ctx.url(route)
+    for url in ('/', url):
+        response = get(svgconf, url, route, **{'If-None-Match': etag})
+        assert response.status_int in (200, 304)
+    response = get(svgconf, url, route)
+    response = get(svgconf, url, route,
+                   **{'If-None-Match': '"%s"' % response.etag})
+    assert response.status_int == 304
+
+
+def test_other_versionmanager(init_svg, get):
+    svgconf = init_svg({'combine': True}, versioned=False)
+    response = get(svgconf, '/?_v=abc', 'score.svg:single/svg',
+                   'set00/icon00000')
+    assert response.status_int == 200
+    assert b'<svg' in response.body
@@ -0,0 +1,170 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import json
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from score.svg._init import Svg
+
+
+VIRTUAL_ICON = '''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" version="1.1"
+     width="%dpx" height="10px"/>
+'''
+
+
+@pytest.fixture
+def conf():
+    return {'combine': True, 'sprite_scales': '200%'}
+
+
+def test_virtual_icon(svgconf, ctx):
+    width = [20]
+    svgconf.virtfiles.register(
+        'virtual.svg', lambda ctx: VIRTUAL_ICON % width[0])
+    for _ in range(2):
+        # the second sprite is loaded from the cache
+        icons = svgconf.sprite(ctx).manifest()['icons']
+        assert icons['virtual']['width'] == 20
+    width[0] = 30
+    icons = svgconf.sprite(ctx).manifest()['icons']
+    assert icons['virtual']['width'] == 30
+
+
+
+def test_scaled_layout(svgconf, ctx):
+    sprite = svgconf.sprite(ctx)
+    scaled = svgconf.sprite(ctx, '200%')
+    assert scaled.width == 2 * sprite.width
+    assert scaled.height == 2 * sprite.height
+    for path in svgconf.paths():
+        height, width = sprite.svg_dimensions[path]
+        assert tuple(scaled.svg_dimensions[path]) == (2 * height, 2 * width)
+        assert scaled.svg_offsets[path] == 2 * sprite.svg_offsets[path]
+    root = ET.fromstring(scaled.content)
+    assert float(root.get('width')) == scaled.width
+    for path, child in zip(svgconf.paths(), root):
+        height, width = scaled.svg_dimensions[path]
+        assert float(child.get('width').rstrip('px')) == width
+        assert float(child.get('height').rstrip('px')) == height
+
+
+def test_scaled_css(svgconf, ctx, rasterizations):
+    path = svgconf.paths()[1]
+    height, width = svgconf.sprite(ctx).svg_dimensions[path]
+    offset = svgconf.sprite(ctx).svg_offsets[path]
+    assert offset < 0
+    css = svgconf.icon_css(ctx, path, '200%')
+    assert 'url(/combined/200%25.png?' in css
+    assert 'url(/combined/200%25.svg?' in css
+    assert 'width:%dpx;height:%dpx;' % (2 * width, 2 * height) in css
+    assert 'background-position:%dpx 0;' % (2 * offset) in css
+    # the scaled sprite needs no background-size
+    assert 'background-size' not in css
+    css = svgconf.icon_css(ctx, path)
+    assert 'url(/combined.png?' in css
+    assert 'background-position:%dpx 0;' % offset in css
+
+
+def test_scaled_png_is_stored(svgconf, ctx, rasterizations, get):
+    route = 'score.svg:combined/png/scaled'
+    url = ctx.url(route, '200%')
+    assert '_v=' in url
+    assert rasterizations == [None]
+    response = get(svgconf, url, route, '200%')
+    assert response.status_int == 200
+    assert response.content_type == 'image/png'
+    assert response.body == b'png'
+    # the stored version was served without rasterizing again
+    assert rasterizations == [None]
+
+
+def test_scaled_url_with_virtual_icon(svgconf, ctx, rasterizations):
+    width = [20]
+    svgconf.virtfiles.register(
+        'virtual.svg', lambda ctx: VIRTUAL_ICON % width[0])
+    route = 'score.svg:combined/svg/scaled'
+    url = ctx.url(route, '200%')
+    assert url == ctx.url(route, '200%')
+    width[0] = 30
+    assert url != ctx.url(route, '200%')
+    icons = svgconf.sprite(ctx, '200%').manifest()['icons']
+    assert icons['virtual']['width'] == 60
+
+
+def test_identical_icons_share_slot(svgconf, ctx, icons, rasterizations):
+    original = svgconf.paths()[1]
+    sprite_width = svgconf.sprite(ctx).width
+    alias = 'zz-alias.svg'
+    shutil.copy(os.path.join(icons, original), os.path.join(icons, alias))
+    sprite = svgconf.sprite(ctx)
+    assert sprite.svg_aliases == {alias: original}
+    assert sprite.svg_offsets[alias] == sprite.svg_offsets[original]
+    assert sprite.svg_dimensions[alias] == sprite.svg_dimensions[original]
+    # the alias takes no space of its own
+    assert sprite.width == sprite_width
+    root = ET.fromstring(sprite.content)
+    views = root.findall('{http://www.w3.org/2000/svg}view')
+    assert [view.get('id') for view in views] == ['zz-alias']
+    height, width = sprite.svg_dimensions[original]
+    assert views[0].get('viewBox').split() == [
+        str(-sprite.svg_offsets[original]), '0', str(width), str(height)]
+    css = svgconf.icon_css(ctx, alias)
+    assert 'background-position:%dpx 0;' % sprite.svg_offsets[original] \
+        in css
+
+
+def test_manifest(svgconf, ctx, rasterizations):
+    manifest = json.loads(svgconf.render_sprite_manifest(ctx))
+    assert manifest['svg'] == ctx.url('score.svg:combined/svg')
+    assert manifest['png'] == ctx.url('score.svg:combined/png')
+    x = 0
+    for path in svgconf.paths():
+        icon = manifest['icons'][Svg.path2css(path)]
+        assert icon['path'] == path
+        assert icon['x'] == x
+        x += icon['width']
+    assert manifest['width'] == x
+    assert manifest['height'] == max(
+        icon['height'] for icon in manifest['icons'].values())
+    scaled = json.loads(svgconf.render_sprite_manifest(ctx, scale='200%'))
+    assert scaled['png'] == ctx.url('score.svg:combined/png/scaled', '200%')
+    assert scaled['width'] == 2 * manifest['width']
+
+
+def test_manifest_route(svgconf, ctx, rasterizations, get):
+    route = 'score.svg:combined/json'
+    url = ctx.url(route)
+    assert url.startswith('/combined.json?')
+    for url in (url, '/combined.json'):
+        response = get(svgconf, url, route)
+        assert response.status_int == 200
+        assert response.json == json.loads(
+            svgconf.render_sprite_manifest(ctx))
@@ -0,0 +1,53 @@
+# Copyright © 2015 STRG.AT GmbH, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in the
+# file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district the
+# Licensee has his registered seat, an establishment or assets.
+
+import pytest
+
+import standins
+
+
+def _init_module(init_svg, color):
+    svgconf = init_svg({'combine': True, 'variant.danger': color})
+    return svgconf, standins.Context(svgconf.http)
+
+
+@pytest.mark.parametrize('route,args', [
+    ('score.svg:single/svg', ('set00/icon00000',)),
+    ('score.svg:combined/svg', ()),
+])
+def test_color_change_creates_new_version(init_svg, get, route, args):
+    svgconf, ctx = _init_module(init_svg, '#c00')
+    urlargs = (args[0] + '.svg',) if args else ()
+    red_url = ctx.url(route, *urlargs, variant='danger')
+    red = get(svgconf, '/?variant=danger', route, *args)
+    assert '#c00' in red.text
+    svgconf, ctx = _init_module(init_svg, '#00c')
+    assert ctx.url(route, *urlargs, variant='danger') != red_url
+    blue = get(svgconf, '/?variant=danger', route, *args, **{
+        'If-None-Match': red.headers['ETag']})
+    assert blue.status_int == 200
+    assert '#00c' in blue.text
+    assert '#c00' not in blue.text